@@ -0,0 +1,125 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from discord.ext.commands import CommandError
+
+# searches that can be sent to Lavalink/Spotify at once across all guilds
+MAX_SEARCHES = 16
+# searches that can wait for one of those slots, any more are turned away right away
+MAX_WAITING = 64
+# seconds a search waits for a slot before it's turned away
+WAIT_TIMEOUT = 10
+# every guild can start this many searches in a burst, then GUILD_RATE searches per second
+GUILD_BURST = 20
+GUILD_RATE = 2.0
+# buckets are only pruned once there are this many, it's cheaper than pruning on every search
+MAX_BUCKETS = 1024
+
+
+class SearchBusy(CommandError):
+    def __init__(self, message: str):
+        self.message = message
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, now: float):
+        self.tokens = float(GUILD_BURST)
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(GUILD_BURST, self.tokens + (now - self.updated) * GUILD_RATE)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until the next token, 0 if there's one already."""
+        return max(0.0, (1 - self.tokens) / GUILD_RATE)
+
+
+class AdmissionControl:
+    """Decides which searches get sent, so a single guild or a spike in usage can't saturate
+    the node. Searches need a token from their guild's bucket and one of MAX_SEARCHES slots,
+    waiting for a slot in a queue of at most MAX_WAITING searches.
+
+    Patient searches (imports) wait for tokens and slots instead of being turned away.
+    """
+
+    def __init__(self):
+        self._slots = asyncio.Semaphore(MAX_SEARCHES)
+        self._buckets: Dict[int, TokenBucket] = {}
+
+        # metrics
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.queue_full = 0
+        self.timed_out = 0
+
+    def _bucket(self, guild_id: int, now: float) -> TokenBucket:
+        if (bucket := self._buckets.get(guild_id)) is None:
+            if len(self._buckets) >= MAX_BUCKETS:
+                self._prune(now)
+            bucket = self._buckets[guild_id] = TokenBucket(now)
+
+        bucket.refill(now)
+        return bucket
+
+    def _prune(self, now: float) -> None:
+        # a full bucket is the same as no bucket
+        for guild_id, bucket in list(self._buckets.items()):
+            bucket.refill(now)
+            if bucket.tokens >= GUILD_BURST:
+                del self._buckets[guild_id]
+
+    async def _take_token(self, guild_id: int, patient: bool) -> None:
+        loop = asyncio.get_running_loop()
+        bucket = self._bucket(guild_id, loop.time())
+
+        while (delay := bucket.delay()) > 0:
+            if not patient:
+                self.rate_limited += 1
+                raise SearchBusy("This server is searching too fast, try again in a few seconds.")
+
+            await asyncio.sleep(delay)
+            bucket.refill(loop.time())
+
+        bucket.tokens -= 1
+
+    async def _take_slot(self, patient: bool) -> None:
+        if not self._slots.locked():
+            return await self._slots.acquire()
+
+        if not patient and self.waiting >= MAX_WAITING:
+            self.queue_full += 1
+            raise SearchBusy("I'm really busy right now, try again in a bit.")
+
+        self.waiting += 1
+        try:
+            if patient:
+                await self._slots.acquire()
+            else:
+                await asyncio.wait_for(self._slots.acquire(), WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise SearchBusy("I'm really busy right now, try again in a bit.")
+        finally:
+            self.waiting -= 1
+
+    @asynccontextmanager
+    async def admit(self, guild_id: int, *, patient: bool = False):
+        """Waits until a search from the guild may run, for the duration of the block.
+        Raises SearchBusy if it's turned away.
+        """
+        await self._take_token(guild_id, patient)
+        await self._take_slot(patient)
+
+        self.admitted += 1
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._slots.release()
@@ -1,13 +1,19 @@
 from datetime import datetime
 from os import listdir, path
 
-from discord import ClientUser, Game, Intents, Message, Status
+from discord import ClientUser, Game, Intents, Member, Message, Status, VoiceState
 from discord.ext import commands
 from discord.ext.commands import when_mentioned_or
-from pomice import Node, NodePool
+from pomice import NodePool
 
 from config import LL_HOST, LL_PORT, LL_PASS, SPOTIFY_ID, SPOTIFY_SECRET, TOKEN
 from context import Context
+from node import ResumingNode
+from recording import RECORD_FILE, record, start_recording, stop_recording
+from tracing import write_pending
+
+# seconds Lavalink keeps players alive after losing the connection, waiting for a resume
+RESUME_TIMEOUT = 60
 
 
 class Bot(commands.Bot):
@@ -21,21 +27,44 @@ class Bot(commands.Bot):
     async def get_context(self, message: Message, *, cls=Context):
         return await super().get_context(message, cls=cls)
 
+    async def on_voice_state_update(self, member: Member, before: VoiceState, after: VoiceState):
+        record(
+            "voice",
+            g=member.guild.id,
+            m=member.id,
+            b=before.channel and before.channel.id,
+            a=after.channel and after.channel.id
+        )
+
+    async def close(self):
+        stop_recording()
+        await super().close()
+        write_pending()
+
     async def _on_first_ready(self):
         await self.wait_until_ready()
 
         self.user: ClientUser
         self.start_time = datetime.utcnow()
 
-        await self.pomice.create_node(
+        if RECORD_FILE is not None:
+            start_recording(RECORD_FILE, bot=self.user.id)
+
+        node = ResumingNode(
+            pool=self.pomice,
             bot=self,
             host=LL_HOST,
             port=LL_PORT,
             password=LL_PASS,
             identifier="MAIN",
+            session=None,
             spotify_client_id=SPOTIFY_ID,
-            spotify_client_secret=SPOTIFY_SECRET
+            spotify_client_secret=SPOTIFY_SECRET,
+            resume_key=f"stolfo-{self.user.id}",
+            resume_timeout=RESUME_TIMEOUT
         )
+        await node.connect()
+        self.pomice.nodes[node._identifier] = node
 
         # loading cogs
         self.load_extension("jishaku")
@@ -1,31 +1,92 @@
 import asyncio
+import heapq
+import json
 import random
 import re
+from collections import defaultdict, deque
 from io import StringIO
 from traceback import format_exception
-from typing import Optional, Type, Union
+from typing import (
+    AsyncIterator, Callable, Deque, Dict, Iterable, List, Optional, Tuple, Type, Union
+)
 
+from aiohttp import ClientSession
 from async_timeout import timeout
-from discord import Color, File, HTTPException, Member, VoiceState
-from discord.embeds import _EmptyEmbed, EmptyEmbed as Empty
+from discord import Color, Embed, File, HTTPException, Member, Message, VoiceChannel, VoiceState
+from discord.embeds import EmptyEmbed as Empty
 from discord.ext import commands
 from discord.ext.commands import Cog, CommandError, CommandInvokeError
 from pomice import Playlist, Track
+from pomice.exceptions import TrackLoadError
 
+from admission import AdmissionControl, SearchBusy
 from bot import Bot
 from config import LOG_CHANNEL
 from context import Context
+from importer import file_kind, read_queries
+from links import Link, TTLCache, classify
 from player import QueuePlayer as Player
+from playlists import PlaylistStore
 from queues import Queue
+from quotas import QuotaExceeded, SearchCounter, fitting_tracks, limits_for
+from titles import TitleIndex
+from tracing import finish_trace, span, start_trace
 
 HH_MM_SS_RE = re.compile(r"(?P<h>\d{1,2}):(?P<m>\d{1,2}):(?P<s>\d{1,2})")
 MM_SS_RE = re.compile(r"(?P<m>\d{1,2}):(?P<s>\d{1,2})")
 HUMAN_RE = re.compile(r"(?:(?P<m>\d+)\s*m\s*)?(?P<s>\d+)\s*[sm]")
 OFFSET_RE = re.compile(r"(?P<s>(?:\-|\+)\d+)\s*s", re.IGNORECASE)
-
-YT_SHORTS_RE = re.compile(r"(?:https?://)?(?:www)?youtube\.com/shorts/([^\n\r?&]+).*?$")
-YT_SHORTS_RE = re.compile(r"(?:https?://)?(?:www)?youtube\.com/shorts/([^\n\r?&/]+).*?$")
-YT_SHORTS_RE = re.compile(r"(?:https?://)?(?:www\.)?youtube\.com/shorts/([^\n\r?&/]+)")
+RANGE_RE = re.compile(r"(?P<start>\d+)\s*-\s*(?P<end>\d+)")
+
+URL_RE = re.compile(r"<?https?://\S+>?")
+
+# how many searches from a single multi-query play command can run at once
+MAX_PARALLEL_SEARCHES = 4
+# how many results of direct links are cached, and for how many seconds
+LINK_CACHE_SIZE = 2048
+LINK_CACHE_TTL = 15 * 60
+# how many tracks and links that failed to play or load are remembered, and for how long
+UNPLAYABLE_CACHE_SIZE = 4096
+UNPLAYABLE_CACHE_TTL = 60 * 60
+# links that found nothing are remembered for less, they may just not be up yet
+NOTHING_FOUND_TTL = 5 * 60
+# the severity lavalink appends to load failures, only COMMON ones are the track's fault,
+# like it being private or region locked, so only those are remembered
+SEVERITY_RE = re.compile(r"\[(\w+)\]$")
+# how many guilds' recently played titles are indexed, and for how long after their last play
+MAX_TITLE_INDEXES = 1024
+TITLE_INDEX_TTL = 24 * 60 * 60
+# whether searches that don't match anything played in their guild try every guild's plays
+GLOBAL_TITLE_INDEX = False
+GLOBAL_TITLE_INDEX_SIZE = 20000
+# unplayable tracks skipped in a row before playback stops instead
+MAX_CONSECUTIVE_FAILURES = 10
+# seconds to stay in a voice channel nobody is listening in, paused, before leaving
+EMPTY_CHANNEL_TIMEOUT = 5 * 60
+# whether the queue is saved as a playlist for the last listener when leaving an empty channel
+SAVE_QUEUE_ON_LEAVE = True
+AUTOSAVE_PLAYLIST = "autosave"
+# seconds to wait for a new voice server after being moved before unpausing anyway, no longer
+# than the fixed sleep this replaced so moves without one don't recover slower
+VOICE_UPDATE_TIMEOUT = 1
+
+# tracks from an imported file are added to the queue in batches of this size
+IMPORT_BATCH_SIZE = 50
+# how many entries of an imported file can be searched or waiting to be queued at once
+IMPORT_WINDOW = 4 * MAX_PARALLEL_SEARCHES
+# seconds between updates of an import's progress message
+IMPORT_PROGRESS_INTERVAL = 5
+# how many failed searches of an import are listed by name
+MAX_LISTED_MISSES = 20
+
+# how many playlists a user can save, and how many tracks each can have
+MAX_PLAYLISTS = 25
+MAX_PLAYLIST_TRACKS = 5000
+
+PLAY_COMMANDS = ("play", "playnext", "playskip", "playshuffle")
+CONNECT_COMMANDS = PLAY_COMMANDS + ("import", "playlist load")
+# commands that can be used without being in a voice channel with the bot
+NO_VOICE_COMMANDS = ("usage", "queuelog", "playlist", "playlist list", "playlist delete")
 
 SPOTIFY_LOGO_URL = "https://cdn.veeps.moe/xKMKPU/spotify.png"
 YOUTUBE_LOGO_URL = "https://cdn.veeps.moe/PPZ97K/youtube.png"
@@ -38,22 +99,161 @@ def format_time(milliseconds: Union[float, int]) -> str:
     return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
 
 
+class TrackDisplay:
+    """A track's display strings, built once when it's queued instead of on every render."""
+
+    __slots__ = ("title", "duration", "thumbnail", "mention", "is_youtube", "entry")
+
+    def __init__(self, track: Track):
+        uri = track.uri or ""
+
+        self.title = track.title if not track.spotify else f"{track.author} - {track.title}"
+        self.duration: Optional[str] = None if track.is_stream else format_time(track.length)
+        self.mention = track.ctx.author.mention
+        self.is_youtube = "youtube.com" in uri or "youtu.be" in uri
+
+        if thumbnail := track.info.get("thumbnail"):
+            self.thumbnail = thumbnail
+        elif self.is_youtube:
+            self.thumbnail = f"https://img.youtube.com/vi/{track.identifier}/mqdefault.jpg"
+        else:
+            self.thumbnail = Empty
+
+        # queue listing line without its number
+        self.entry = f"[{self.title}]({uri}) **[{self.duration or 'stream'}] ({self.mention})"
+
+
+def track_display(track: Track) -> TrackDisplay:
+    """Returns the track's cached display strings, building them if they aren't yet."""
+    try:
+        return track.display
+    except AttributeError:
+        track.display = display = TrackDisplay(track)
+        return display
+
+
+def copy_track(track: Track, ctx: Optional[Context]) -> Track:
+    return Track(
+        track_id=track.track_id,
+        info=track.info,
+        ctx=ctx,
+        spotify=track.spotify,
+        search_type=track._search_type
+    )
+
+
+def copy_result(
+    result: Union[List[Track], Playlist, None],
+    ctx: Optional[Context]
+) -> Union[List[Track], Playlist, None]:
+    """Copies a search result with its tracks requested by ctx's author, so a result shared
+    between commands can be changed and queued by each of them separately.
+    """
+    if result is None:
+        return None
+
+    if isinstance(result, Playlist):
+        return Playlist(
+            playlist_info=result.playlist_info,
+            # Lavalink playlists build their tracks from the raw ones
+            tracks=[copy_track(t, ctx) for t in result.tracks] if result.spotify
+            else result.tracks_raw,
+            ctx=ctx,
+            spotify=result.spotify,
+            thumbnail=result._thumbnail,
+            uri=result._uri
+        )
+
+    return [copy_track(track, ctx) for track in result]
+
+
+def join_lines(lines: Iterable[str], limit: int = 1024) -> str:
+    """Joins as many whole lines as fit in an embed field."""
+    joined = []
+    length = -1
+    for line in lines:
+        length += len(line) + 1
+        if length > limit:
+            break
+        joined.append(line)
+
+    return "\n".join(joined)
+
+
+def split_queries(query: str) -> List[str]:
+    """Splits a play command's query into one query per line, or per link on lines that
+    only contain links.
+    """
+    queries = []
+    for line in query.splitlines():
+        if not (words := line.split()):
+            continue
+
+        if len(words) > 1 and all(URL_RE.fullmatch(word) for word in words):
+            queries.extend(words)
+        else:
+            queries.append(line.strip())
+
+    return queries
+
+
 class UserError(CommandError):
     def __init__(self, message: str):
         self.message = message
 
 
+class RecentlyUnplayable(UserError):
+    pass
+
+
+def is_common_failure(error: TrackLoadError) -> bool:
+    return (match := SEVERITY_RE.search(str(error))) is not None and match[1] == "COMMON"
+
+
 class Music(Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
+        self.connect_locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        # (link key, patient) -> search that's running
+        self.searches: Dict[Tuple[str, bool], asyncio.Future] = {}
+        self.search_counter = SearchCounter()
+        self.playlists = PlaylistStore()
+        self.admission = AdmissionControl()
+        # link key -> search result, shared by every spelling of the same link
+        self.link_cache = TTLCache(LINK_CACHE_SIZE, LINK_CACHE_TTL)
+        # track identifier or link key -> why it couldn't be played or loaded
+        self.unplayable = TTLCache(UNPLAYABLE_CACHE_SIZE, UNPLAYABLE_CACHE_TTL)
+        # guild ID -> index of the titles played there, searches for them skip lavalink
+        self.title_indexes = TTLCache(MAX_TITLE_INDEXES, TITLE_INDEX_TTL)
+        self.global_titles = TitleIndex(GLOBAL_TITLE_INDEX_SIZE) if GLOBAL_TITLE_INDEX else None
+        self.title_hits = 0
+
+    def cog_unload(self):
+        self.playlists.close()
 
     async def cog_before_invoke(self, ctx: Context):
-        if ctx.guild is not None:
-            return await self.ensure_voice(ctx)
-        raise UserError("Music commands are disabled in DMs.")
+        if ctx.guild is None:
+            raise UserError("Music commands are disabled in DMs.")
+
+        if ctx.command.qualified_name in NO_VOICE_COMMANDS:
+            return
+
+        if ctx.command.name in PLAY_COMMANDS:
+            start_trace(guild=ctx.guild.id, command=ctx.command.name)
+
+        try:
+            with span("ensure_voice"):
+                return await self.ensure_voice(ctx)
+        except Exception as e:
+            # the command won't run, so neither will cog_after_invoke
+            finish_trace(failed=True, error=type(e).__name__)
+            raise
+
+    async def cog_after_invoke(self, ctx: Context):
+        finish_trace(failed=ctx.command_failed)
 
     async def ensure_voice(self, ctx: Context):
-        should_connect = ctx.command.name in ("play", "playnext", "playskip", "playshuffle")
+        should_connect = ctx.command.qualified_name in CONNECT_COMMANDS
 
         if not ctx.author.voice or not ctx.author.voice.channel:
             raise UserError("You're not connected to a voice channel!")
@@ -74,20 +274,31 @@ class Music(Cog):
             if not permissions.speak:
                 raise UserError("I'm missing permissions to speak in your voice channel!")
 
-            await channel.connect(cls=Player)
-            ctx.voice_client.bound_channel = ctx.channel  # type: ignore
-            await ctx.send(embed=ctx.embed(
-                f"Connected to {channel.name}!",
-                f"Music commands are bound to {ctx.channel.mention}."
-            ))
-        else:
-            if should_connect and not ctx.voice_client.channel:
-                await channel.connect(cls=ctx.voice_client)
-                ctx.voice_client.bound_channel = ctx.channel
+            # play commands aren't serialized anymore, so make sure only one of them connects
+            async with self.connect_locks[ctx.guild.id]:
+                if ctx.voice_client:
+                    return await self.ensure_voice(ctx)
+
+                with span("connect"):
+                    await channel.connect(cls=Player)
+                ctx.voice_client.bound_channel = ctx.channel  # type: ignore
                 await ctx.send(embed=ctx.embed(
                     f"Connected to {channel.name}!",
                     f"Music commands are bound to {ctx.channel.mention}."
                 ))
+        else:
+            if should_connect and not ctx.voice_client.channel:
+                async with self.connect_locks[ctx.guild.id]:
+                    if ctx.voice_client.channel:
+                        return await self.ensure_voice(ctx)
+
+                    with span("connect"):
+                        await channel.connect(cls=ctx.voice_client)
+                    ctx.voice_client.bound_channel = ctx.channel
+                    await ctx.send(embed=ctx.embed(
+                        f"Connected to {channel.name}!",
+                        f"Music commands are bound to {ctx.channel.mention}."
+                    ))
             elif int(ctx.voice_client.channel.id) != channel.id:
                 raise UserError("You need to be in my voice channel to use this!")
             elif ctx.voice_client.bound_channel and ctx.channel != ctx.voice_client.bound_channel:
@@ -95,7 +306,7 @@ class Music(Cog):
                 raise UserError(f"Music commands are currently bound to #{bound_channel.name}.")
 
     async def cog_command_error(self, ctx: Context, error: Type[CommandError]):
-        if isinstance(error, UserError):
+        if isinstance(error, (UserError, QuotaExceeded, SearchBusy)):
             await ctx.send(embed=ctx.embed(error.message))
         elif isinstance(error, CommandInvokeError):
             error = error.original
@@ -103,23 +314,29 @@ class Music(Cog):
             embed.color = Color(0xFF0E0E)
             await ctx.send(embed=embed)
 
-            log = self.bot.get_channel(LOG_CHANNEL)
-            full_traceback = "".join(
-                format_exception(type(error), error, error.__traceback__, chain=True)
-            )
+            await self.log_exception(ctx, error, "Command exception caught!")
 
-            embed = ctx.embed(
-                "Command exception caught!",
-                f"```python\n{full_traceback}\n```" if len(full_traceback) <= 4000 else Empty
-            )
-            embed.add_field(name="Message", value=f"`{ctx.message.content}`")
-            embed.add_field(name="Guild", value=f"{ctx.guild.name} ({ctx.guild.id})")
+    async def log_exception(self, ctx: Context, error: Exception, title: str):
+        """Sends the error's traceback to the log channel."""
+        if (log := self.bot.get_channel(LOG_CHANNEL)) is None:
+            return
+
+        full_traceback = "".join(
+            format_exception(type(error), error, error.__traceback__, chain=True)
+        )
+
+        embed = ctx.embed(
+            title,
+            f"```python\n{full_traceback}\n```" if len(full_traceback) <= 4000 else Empty
+        )
+        embed.add_field(name="Message", value=f"`{ctx.message.content}`")
+        embed.add_field(name="Guild", value=f"{ctx.guild.name} ({ctx.guild.id})")
 
-            if len(full_traceback) > 4000:
-                file = File(StringIO(full_traceback), "traceback.txt")
-                return await log.send(embed=embed, file=file)
+        if len(full_traceback) > 4000:
+            file = File(StringIO(full_traceback), "traceback.txt")
+            return await log.send(embed=embed, file=file)
 
-            await log.send(embed=embed)
+        await log.send(embed=embed)
 
     @Cog.listener()
     async def on_voice_state_update(self, member: Member, before: VoiceState, after: VoiceState):
@@ -134,10 +351,97 @@ class Music(Cog):
             return await player.destroy()
 
         if player.is_playing and before.channel != after.channel:
-            paused = player.is_paused
+            # registered before anything is awaited so the voice server update can't be missed
+            voice_update = player.next_voice_update()
+            # whether it was paused with the pause command, auto pausing is decided again for
+            # the new channel
+            paused = player.is_paused and not player.auto_paused
             await player.set_pause(True)
-            await asyncio.sleep(1)
-            await player.set_pause(paused)
+
+            try:
+                await asyncio.wait_for(voice_update, VOICE_UPDATE_TIMEOUT)
+            except asyncio.TimeoutError:
+                # discord didn't send a new voice server, the old connection still works
+                pass
+            finally:
+                player.discard_voice_update(voice_update)
+
+            # track_listeners doesn't auto pause while this has it paused, so it's done here
+            if not paused and not self.has_listeners(player.channel):
+                player.auto_paused = True
+            await player.set_pause(paused or player.auto_paused)
+
+    @Cog.listener("on_voice_state_update")
+    async def track_listeners(self, member: Member, before: VoiceState, after: VoiceState):
+        if (player := self.bot.pomice.get_node().get_player(member.guild.id)) is None:
+            return
+
+        if player.is_dead or player.channel is None:
+            return
+
+        channel = player.channel
+        if (
+            before.channel != channel and after.channel != channel
+            and member.id != self.bot.user.id
+        ):
+            return
+
+        if not member.bot and before.channel == channel and after.channel != channel:
+            player.last_listener_id = member.id
+
+        if self.has_listeners(channel):
+            if player.empty_timer is not None:
+                player.empty_timer.cancel()
+                player.empty_timer = None
+
+            if player.auto_paused:
+                player.auto_paused = False
+                await player.set_pause(False)
+        elif player.empty_timer is None:
+            player.empty_timer = asyncio.create_task(self.leave_when_empty(player))
+
+            if player.is_playing and not player.is_paused:
+                player.auto_paused = True
+                await player.set_pause(True)
+
+    @staticmethod
+    def is_listening(member: Member) -> bool:
+        return not member.bot and not (member.voice.deaf or member.voice.self_deaf)
+
+    def has_listeners(self, channel: VoiceChannel) -> bool:
+        return channel is not None and any(self.is_listening(m) for m in channel.members)
+
+    async def leave_when_empty(self, player: Player):
+        """Leaves the player's channel after EMPTY_CHANNEL_TIMEOUT seconds, saving the queue for
+        the last listener to leave if SAVE_QUEUE_ON_LEAVE is set.
+        """
+        await asyncio.sleep(EMPTY_CHANNEL_TIMEOUT)
+        # it's done, and cancelling it would interrupt destroy
+        player.empty_timer = None
+
+        tracks = list(player.queue)
+        if player.current is not None:
+            tracks.insert(0, player.current)
+
+        embed = Embed(color=Context.color)
+        embed.set_author(name=f"Left {player.channel.name} since nobody was listening.")
+
+        if SAVE_QUEUE_ON_LEAVE and tracks and player.last_listener_id is not None:
+            count = await self.playlists.run(
+                self.playlists.save,
+                player.last_listener_id, AUTOSAVE_PLAYLIST, tracks[:MAX_PLAYLIST_TRACKS]
+            )
+            embed.description = (
+                f"Saved {count} track{'' if count == 1 else 's'} for "
+                f"<@{player.last_listener_id}>, use `playlist load {AUTOSAVE_PLAYLIST}` "
+                "to pick up where you left off."
+            )
+
+        player.queue.clear()
+        await player.destroy()
+
+        if player.bound_channel is not None:
+            await player.bound_channel.send(embed=embed)
 
     @Cog.listener()
     async def on_pomice_track_start(self, player: Player, track: Track):
@@ -145,31 +449,39 @@ class Music(Cog):
 
         if player.shuffle:
             player.queue.history.put(track.original)
+        self.index_title(player.guild.id, track)
 
-        if track.is_stream:
-            length = "🔴 Live"
-        else:
-            length = format_time(track.original.length)
-
-        title = track.title if not track.spotify else f"{track.author} - {track.title}"
+        display = track_display(track)
         embed = ctx.embed(
-            f"Now playing: {title}",
+            f"Now playing: {display.title}",
             url=track.uri,
-            thumbnail_url=self.get_embed_thumbnail(track)
+            thumbnail_url=display.thumbnail
         )
+        # spotify tracks only know their length for sure once they're resolved on youtube
+        length = track_display(track.original).duration or "🔴 Live"
         embed.add_field(name="Duration", value=length)
-        embed.add_field(name="Requested by", value=ctx.author.mention)
+        embed.add_field(name="Requested by", value=display.mention)
 
         if track.spotify:
             embed.set_footer(
                 text=f"{ctx.prefix}np for YouTube track information",
                 icon_url=SPOTIFY_LOGO_URL
             )
-        elif "youtube.com" in track.uri:
+        elif display.is_youtube:
             embed.set_footer(text="\u200b", icon_url=YOUTUBE_LOGO_URL)
 
         track.np_message = await ctx.send(embed=embed)
 
+    @Cog.listener()
+    async def on_pomice_track_exception(self, player: Player, track: Track, error: str):
+        if track is not None:
+            self.unplayable.put(track.identifier, "Lavalink couldn't play it")
+
+    @Cog.listener()
+    async def on_pomice_track_stuck(self, player: Player, track: Track, _):
+        if track is not None:
+            self.unplayable.put(track.identifier, "It got stuck while playing")
+
     @Cog.listener()
     async def on_pomice_track_end(self, player: Player, track: Track, _):
         try:
@@ -177,62 +489,264 @@ class Music(Cog):
         except (HTTPException, AttributeError):
             pass
 
+        # (track, reason) for every track skipped since the last one that played
+        skipped = []
+
         try:
             async with timeout(300):
-                if player.shuffle:
-                    next_track = await player.shuffled_queue.get_wait()
-                    del player.queue[player.queue.find_position(next_track)]
-                else:
-                    next_track = await player.queue.get_wait()
-
-                try:
-                    await player.play(next_track, ignore_if_playing=True)
-                except Exception as e:
-                    if next_track.spotify and isinstance(e, TypeError):
-                        await next_track.ctx.send(embed=next_track.ctx.embed(
-                            f"No results found for Spotify track {next_track} - skipping."
-                        ))
-                    else:
-                        await next_track.ctx.send(embed=next_track.ctx.embed(
-                            f"Something went wrong while playing {next_track} - skipping."
-                        ))
-                        print(e)
-
-                    await self.on_pomice_track_end(player, next_track, "error playing next")
+                while True:
+                    queue = player.shuffled_queue if player.shuffle else player.queue
+                    if skipped and queue.is_empty:
+                        # don't hold the notice back while waiting for more tracks
+                        await self.send_skip_notice(skipped)
+                        skipped = []
+
+                    next_track = await queue.get_wait()
+                    if player.shuffle:
+                        del player.queue[player.queue.find_position(next_track)]
+
+                    try:
+                        if (reason := await self.try_play(player, next_track)) is None:
+                            break
+                    except Exception as e:
+                        self.requeue(player, next_track)
+                        await self.log_exception(
+                            next_track.ctx, e, "Couldn't start the next track"
+                        )
+                        break
+
+                    skipped.append((next_track, reason))
+                    if len(skipped) >= MAX_CONSECUTIVE_FAILURES:
+                        # the next play command starts playback again
+                        player.has_started = False
+                        break
         except asyncio.TimeoutError:
             if not player.is_dead and not player.is_playing:
                 await player.destroy()
 
-    def get_embed_thumbnail(self, track: Track) -> Union[str, _EmptyEmbed]:
-        if thumbnail := track.info.get("thumbnail"):
-            return thumbnail
-        elif any(i in track.uri for i in ("youtu.be", "youtube.com")):
-            return f"https://img.youtube.com/vi/{track.identifier}/mqdefault.jpg"
-        else:
-            return Empty
+        if skipped:
+            await self.send_skip_notice(skipped)
+
+    async def try_play(self, player: Player, track: Track) -> Optional[str]:
+        """Plays the track, or returns why it can't be played and remembers that it can't.
+        Failures that aren't the track's fault, like the node being unavailable, are raised.
+        """
+        if (reason := self.unplayable.get(track.identifier)) is not None:
+            return reason
+
+        try:
+            await player.play(track, ignore_if_playing=True)
+            return None
+        except TrackLoadError as e:
+            if not is_common_failure(e):
+                return "It couldn't be loaded right now"
+            reason = "It couldn't be loaded"
+        except TypeError:
+            # what pomice raises when a spotify track has no youtube match
+            if not track.spotify:
+                raise
+            reason = "No results found on YouTube"
+
+        self.unplayable.put(track.identifier, reason)
+        return reason
+
+    @staticmethod
+    def requeue(player: Player, track: Track):
+        """Puts a track that couldn't be started back at the front, for the next play command
+        to start playback with again.
+        """
+        if player.shuffle:
+            player.shuffled_queue.put_at_front(track)
+        player.queue.put_at_front(track)
+        player.has_started = False
+
+    async def start_playback(self, player: Player, track: Track):
+        """Plays the track taken by take_first_track. Tracks that can't be played are skipped
+        like when a track ends, and if none can be the next play command tries again.
+        """
+        skipped = []
+
+        try:
+            while (reason := await self.try_play(player, track)) is not None:
+                skipped.append((track, reason))
+
+                queue = player.shuffled_queue if player.shuffle else player.queue
+                if len(skipped) >= MAX_CONSECUTIVE_FAILURES or queue.is_empty:
+                    player.has_started = False
+                    break
+
+                player.has_started = False
+                track = self.take_first_track(player)
+        except Exception:
+            self.requeue(player, track)
+            raise
+        finally:
+            if skipped:
+                await self.send_skip_notice(skipped)
+
+    async def send_skip_notice(self, skipped: List[Tuple[Track, str]]):
+        ctx: Context = skipped[-1][0].ctx
+        lines = (f"{track_display(track).title} - {reason}" for track, reason in skipped)
+        embed = ctx.embed(
+            f"Skipped {len(skipped)} unplayable track{'' if len(skipped) == 1 else 's'}",
+            "\n".join(lines)[:4000]
+        )
+
+        if len(skipped) >= MAX_CONSECUTIVE_FAILURES:
+            embed.set_footer(
+                text=f"Stopped after {len(skipped)} in a row, use {ctx.prefix}play to continue."
+            )
+
+        await ctx.send(embed=embed)
 
-    def format_queue(self, queue: Queue) -> str:
+    def format_queue(
+        self,
+        queue: Queue,
+        limit: int = 4000,
+        start: Optional[int] = None
+    ) -> List[str]:
+        """Formats the queue in play order, stopping once the lines reach `limit` characters.
+        If `start` is the time until the first track plays, lines also show when they play.
+        """
         items = []
+        total = 0
+        eta = start
         for i, track in enumerate(queue):
-            title = track.title if not track.spotify else f"{track.author} - {track.title}"
-            items.append(
-                f"**{i + 1}: [{title}]({track.uri}) **"
-                f"[{'stream' if track.is_stream else format_time(track.length)}] "
-                f"({track.ctx.author.mention})"
-            )
+            entry = f"**{i + 1}: {track_display(track).entry}"
+            items.append(entry if eta is None else f"{entry} · in {format_time(eta)}")
+
+            if eta is not None:
+                eta = None if track.is_stream else eta + track.length
+
+            total += len(items[-1]) + 1
+            if total >= limit:
+                break
 
         return items
 
-    async def get_tracks(self, ctx: Context, query: str):
-        query = query.strip("< >")
+    def remove_matching(self, player: Player, predicate: Callable[[Track], bool]) -> List[Track]:
+        """Removes the tracks the predicate is True for from the player's queues."""
+        removed = player.queue.remove_if(predicate)
+        if player.shuffle:
+            removed = player.shuffled_queue.remove_if(predicate)
+
+        return removed
+
+    def bulk_remove_embed(self, ctx: Context, removed: List[Track]) -> Embed:
+        embed = ctx.embed(f"Removed {len(removed)} song{'' if len(removed) == 1 else 's'}!")
+
+        if not any(t.is_stream for t in removed):
+            embed.add_field(name="Duration", value=format_time(sum(t.length for t in removed)))
 
-        # patch youtube.com/shorts links to their video counterparts
-        if YT_SHORTS_RE.match(query):
-            query = YT_SHORTS_RE.sub(r"https://youtube.com/watch?v=\1", query)
+        requesters = {track_display(t).mention for t in removed}
+        if len(requesters) == 1:
+            embed.add_field(name="Requested by", value=requesters.pop())
 
-        return await ctx.voice_client.get_tracks(query, ctx=ctx)
+        return embed
 
-    async def send_play_command_embed(self, ctx: Context, search: Union[Track, Playlist]):
+    def time_until(self, player: Player, queue: Queue, index: int) -> Optional[int]:
+        """Returns how many milliseconds until the track at the given queue position plays,
+        or None if there's a stream before it.
+        """
+        # the whole queue's totals are kept up to date, only a part of it has to be summed
+        length, streams = queue.duration if index >= len(queue) else queue.duration_until(index)
+        if streams:
+            return None
+
+        if player.current is not None:
+            current = player.current.original
+            if current.is_stream:
+                return None
+
+            length += current.length - player.position
+
+        return length
+
+    def index_title(self, guild_id: int, track: Track):
+        """Adds a track that started playing to the title indexes. Spotify tracks are indexed
+        by their own title, but searches for them get the youtube track they played as.
+        """
+        if track.original is None:
+            return
+
+        # the requester's context isn't kept alive by the index
+        played = copy_track(track.original, None)
+
+        if (index := self.title_indexes.get(guild_id)) is None:
+            index = TitleIndex()
+        # put either way, so the index expires a day after the guild's last play
+        self.title_indexes.put(guild_id, index)
+
+        for titles in (index, self.global_titles):
+            if titles is not None:
+                titles.add(played, track.title, track.author)
+
+    def match_title(self, guild_id: int, query: str) -> Optional[Track]:
+        """Returns a recently played track the search query names, if there's a playable one."""
+        for index in (self.title_indexes.get(guild_id), self.global_titles):
+            if index is None or (track := index.match(query)) is None:
+                continue
+
+            if self.unplayable.get(track.identifier) is None:
+                return track
+            index.remove(track.identifier)
+
+        return None
+
+    async def get_tracks(self, ctx: Context, query: str, *, patient: bool = False):
+        """Searches for the query once admission control lets it through, raising SearchBusy
+        if it's turned away. Patient searches wait for their turn instead.
+        Searches for something played recently are answered from the title indexes.
+        """
+        link = classify(query)
+
+        if not link.is_direct and (track := self.match_title(ctx.guild.id, link.query)):
+            self.title_hits += 1
+            return [copy_track(track, ctx)]
+        if (cached := self.link_cache.get(link.key)) is not None:
+            return copy_result(cached, ctx)
+        if (reason := self.unplayable.get(link.key)) is not None:
+            raise RecentlyUnplayable(
+                f"That link didn't work recently: {reason}. Try again later."
+            )
+
+        # identical searches running at the same time share one request. patient ones are
+        # shared separately, so an import can't be turned away along with a play command
+        key = (link.key, patient)
+        shared = key in self.searches
+
+        if not shared:
+            search = asyncio.ensure_future(self.admitted_search(ctx, link, patient))
+            search.add_done_callback(lambda _: self.searches.pop(key, None))
+            self.searches[key] = search
+
+        with span("get_tracks", kind=link.kind, spotify=link.is_spotify, shared=shared):
+            # shielded so a cancelled caller doesn't cancel the search for everyone else
+            result = await asyncio.shield(self.searches[key])
+
+        return copy_result(result, ctx)
+
+    async def admitted_search(self, ctx: Context, link: Link, patient: bool):
+        async with self.admission.admit(ctx.guild.id, patient=patient):
+            try:
+                result = await ctx.voice_client.get_tracks(link.query, ctx=ctx)
+            except TrackLoadError as e:
+                # lavalink found it but can't load it, e.g. it's region locked or private
+                if link.is_direct and is_common_failure(e):
+                    self.unplayable.put(link.key, "It couldn't be loaded")
+                raise
+
+        # what a link points to doesn't change much, unlike search results
+        if link.is_direct:
+            if result:
+                # without the first requester's context, so it isn't kept alive by the cache
+                self.link_cache.put(link.key, copy_result(result, None))
+            else:
+                self.unplayable.put(link.key, "Nothing found", NOTHING_FOUND_TTL)
+
+        return result
+
+    def play_command_embed(self, ctx: Context, search: Union[Track, Playlist]) -> Embed:
         if isinstance(search, Playlist):
             if ctx.command.name in ("playnext", "playskip"):
                 last_position = search.track_count
@@ -266,153 +780,441 @@ class Music(Cog):
             else:
                 queue_position = len(ctx.voice_client.queue)
 
-            if search.is_stream:
-                length = "🔴 Live"
-            else:
-                length = format_time(search.length)
-
+            display = track_display(search)
             embed = ctx.embed(
-                f"Queued {search.title}",
+                f"Queued {display.title}",
                 url=search.uri,
-                thumbnail_url=self.get_embed_thumbnail(search)
+                thumbnail_url=display.thumbnail
             )
-            embed.add_field(name="Duration", value=length)
+            embed.add_field(name="Duration", value=display.duration or "🔴 Live")
             embed.add_field(name="Position in queue", value=queue_position)
 
-        await ctx.send(embed=embed)
+        return embed
 
-    @commands.command(aliases=["p"])
-    @commands.max_concurrency(1, commands.BucketType.guild, wait=True)
-    async def play(self, ctx: Context, *, query: str = None):
-        """Queues one or multiple tracks. Can be used to resume the player if paused."""
-        player = ctx.voice_client
+    def bulk_play_embed(
+        self,
+        ctx: Context,
+        queries: List[str],
+        tracks: List[Track],
+        missed: List[str]
+    ) -> Embed:
+        last_position = len(ctx.voice_client.queue)
+        first_position = last_position - len(tracks) + 1
 
-        if player.is_paused and not query:
-            await player.set_pause(False)
-            return await ctx.send(embed=ctx.embed("Resumed player!"))
-        elif not query:
-            return
+        embed = ctx.embed(
+            f"Queued {len(tracks)} track{'' if len(tracks) == 1 else 's'} "
+            f"from {len(queries)} searches",
+            "\n".join(f"Nothing found for `{query}`." for query in missed)[:4000] or Empty
+        )
 
-        if not (search := await self.get_tracks(ctx, query)):
-            return await ctx.send(embed=ctx.embed("Nothing found."))
+        if any(t.is_stream for t in tracks):
+            embed.add_field(name="# of tracks", value=len(tracks))
+        else:
+            embed.add_field(name="Duration", value=format_time(sum(t.length for t in tracks)))
 
-        if isinstance(search, Playlist):
-            tracks = search.tracks
+        embed.add_field(name="Position in queue", value=f"{first_position}-{last_position}")
+        return embed
 
-            for track in tracks:
-                player.queue.put(track)
-                if player.shuffle:
-                    player.shuffled_queue.put(track)
+    async def get_tracks_bulk(self, ctx: Context, queries: List[str]) -> list:
+        """Runs the searches for all queries concurrently, at most MAX_PARALLEL_SEARCHES at once.
+        Results are in the same order as the queries, with None for searches that found nothing
+        or couldn't be loaded.
+        """
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_SEARCHES)
+        results = await asyncio.gather(
+            *(self.try_get_tracks(ctx, query, semaphore) for query in queries),
+            return_exceptions=True
+        )
 
-            await self.send_play_command_embed(ctx, search)
-        else:
-            track = search[0]
+        # being turned away or the node failing isn't the same as finding nothing, the whole
+        # command fails like a single search would
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+        return results
+
+    async def try_get_tracks(
+        self,
+        ctx: Context,
+        query: str,
+        semaphore: asyncio.Semaphore,
+        *,
+        patient: bool = False
+    ):
+        async with semaphore:
+            try:
+                return await self.get_tracks(ctx, query, patient=patient)
+            except TrackLoadError as e:
+                # one entry that can't be loaded doesn't fail the rest, it's listed as missed
+                await self.log_exception(ctx, e, f"Couldn't load `{query[:200]}`")
+            except RecentlyUnplayable:
+                pass
+
+    async def get_tracks_streamed(self, ctx: Context, queries: AsyncIterator[str]):
+        """Searches for queries as they're read, at most MAX_PARALLEL_SEARCHES at once, and
+        yields (query, result) pairs in query order. At most IMPORT_WINDOW queries are read
+        ahead of the results that were yielded.
+        """
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_SEARCHES)
+        pending: Deque[Tuple[str, asyncio.Task]] = deque()
 
-            player.queue.put(track)
-            if player.shuffle:
-                player.shuffled_queue.put(track)
+        try:
+            async for query in queries:
+                task = asyncio.create_task(
+                    self.try_get_tracks(ctx, query, semaphore, patient=True)
+                )
+                pending.append((query, task))
 
-            if player.is_playing:
-                await self.send_play_command_embed(ctx, track)
+                if len(pending) >= IMPORT_WINDOW:
+                    query, task = pending.popleft()
+                    yield query, await task
 
-        if not player.is_playing and not player.has_started:
-            await player.play(player.queue.get())
-            player.has_started = True
+            while pending:
+                query, task = pending.popleft()
+                yield query, await task
+        finally:
+            for _, task in pending:
+                task.cancel()
 
-    @commands.command(aliases=["pn", "playtop", "pt"])
-    @commands.max_concurrency(1, commands.BucketType.guild, wait=True)
-    async def playnext(self, ctx: Context, *, query: str):
-        """Same as play command, but adds to the start of the queue."""
-        player = ctx.voice_client
-        if not (search := await self.get_tracks(ctx, query)):
-            return await ctx.send(embed=ctx.embed("Nothing found."))
+    def playable(self, tracks: List[Track]) -> List[Track]:
+        """Returns the tracks that haven't failed to play recently."""
+        if not len(self.unplayable):
+            return tracks
 
-        if isinstance(search, Playlist):
-            tracks = search.tracks
+        return [track for track in tracks if self.unplayable.get(track.identifier) is None]
 
-            for track in reversed(tracks):
-                player.queue.put_at_front(track)
-                if player.shuffle:
-                    player.shuffled_queue.put_at_front(track)
+    def take_first_track(self, player: Player) -> Optional[Track]:
+        """Takes the track to start playing from the queue if the player hasn't started yet."""
+        if player.is_playing or player.has_started:
+            return None
 
-            await self.send_play_command_embed(ctx, search)
+        if player.shuffle:
+            track = player.shuffled_queue.get()
+            del player.queue[player.queue.find_position(track)]
         else:
-            track = search[0]
+            track = player.queue.get()
+
+        player.has_started = True
+        return track
+
+    async def enqueue_batch(
+        self,
+        player: Player,
+        tracks: List[Track]
+    ) -> Tuple[int, int, Optional[str]]:
+        """Adds tracks to the end of the queue in the player's enqueue order, starting playback
+        if it hasn't started yet. Returns how many were queued, how many were skipped as
+        duplicates or unplayable, and why the rest went over the guild's limits, if any did.
+        """
+        ticket = player.take_ticket()
+        next_track = over_limit = None
+        playable = self.playable(tracks)
+        skipped = len(tracks) - len(playable)
+        tracks = playable
 
-            player.queue.put_at_front(track)
-            if player.shuffle:
-                player.shuffled_queue.put_at_front(track)
+        try:
+            await ticket.wait()
 
-            if player.is_playing:
-                await self.send_play_command_embed(ctx, track)
+            if player.queue.dedup:
+                unique = player.queue.filter_duplicates(tracks)
+                skipped += len(tracks) - len(unique)
+                tracks = unique
 
-        if not player.is_playing and not player.has_started:
-            await player.play(player.queue.get())
-            player.has_started = True
+            fitting, over_limit = fitting_tracks(player.queue, tracks, limits_for(player.guild.id))
+            tracks = tracks[:fitting]
 
-    @commands.command(aliases=["ps"])
-    @commands.max_concurrency(1, commands.BucketType.guild, wait=True)
-    async def playskip(self, ctx: Context, *, query: str):
-        """Same as playnext, but also skips the currently playing track."""
+            if tracks:
+                player.queue.extend(tracks)
+                if player.shuffle:
+                    player.shuffle_in(tracks)
+                next_track = self.take_first_track(player)
+        finally:
+            ticket.release()
+
+        if next_track is not None:
+            await self.start_playback(player, next_track)
+
+        return len(tracks), skipped, over_limit
+
+    async def search_and_enqueue(
+        self,
+        ctx: Context,
+        queries: List[str],
+        *,
+        at_front: bool = False,
+        shuffle: bool = False,
+        skip: bool = False
+    ):
+        """Searches for the queries and adds the results to the player's queue.
+        Only adding to the queue waits for the player's enqueue order, so searches from
+        several commands run concurrently while their tracks still get queued in the order
+        the commands were used.
+        """
         player = ctx.voice_client
-        if not (search := await self.get_tracks(ctx, query)):
-            return await ctx.send(embed=ctx.embed("Nothing found."))
+        ticket = player.take_ticket()
+        next_track = embed = None
+        stop = False
 
-        if isinstance(search, Playlist):
-            tracks = search.tracks
+        try:
+            with self.search_counter.claim(ctx.guild.id, ctx.author.id, limits_for(ctx.guild.id)):
+                if len(queries) == 1:
+                    results = [await self.get_tracks(ctx, queries[0])]
+                else:
+                    results = await self.get_tracks_bulk(ctx, queries)
+
+            tracks = []
+            for search in results:
+                if isinstance(search, Playlist):
+                    if shuffle:
+                        random.shuffle(search.tracks)
+                    tracks.extend(search.tracks)
+                elif search:
+                    tracks.append(search[0])
+
+            playable = self.playable(tracks)
+            unplayable = len(tracks) - len(playable)
+            tracks = playable
+
+            # built before waiting for our turn, so later renders only look them up
+            for track in tracks:
+                track_display(track)
+
+            with span("enqueue_wait"):
+                await ticket.wait()
+
+            duplicates = 0
+            if player.queue.dedup and tracks:
+                unique = player.queue.filter_duplicates(tracks)
+                duplicates = len(tracks) - len(unique)
+                tracks = unique
+
+            fitting, over_limit = fitting_tracks(player.queue, tracks, limits_for(ctx.guild.id))
+            if not fitting and over_limit:
+                raise QuotaExceeded(over_limit)
+            rejected = len(tracks) - fitting
+            tracks = tracks[:fitting]
+
+            changed = duplicates or rejected or unplayable
+            if changed and len(results) == 1 and isinstance(results[0], Playlist):
+                results[0].tracks = tracks
+                results[0].track_count = len(tracks)
+
+            if not tracks:
+                if duplicates:
+                    embed = ctx.embed(
+                        "Already in the queue!",
+                        f"Use `{ctx.prefix}nodupes` to allow queueing duplicates."
+                    )
+                elif unplayable:
+                    embed = ctx.embed(
+                        "Can't play that right now!",
+                        "It failed to play recently, try again later."
+                    )
+                else:
+                    embed = ctx.embed("Nothing found.")
+            else:
+                with span("enqueue", tracks=len(tracks)):
+                    if at_front:
+                        for track in reversed(tracks):
+                            player.queue.put_at_front(track)
+                            if player.shuffle:
+                                player.shuffled_queue.put_at_front(track)
+                    else:
+                        player.queue.extend(tracks)
+                        if player.shuffle:
+                            player.shuffle_in(tracks)
+
+                if len(queries) > 1:
+                    missed = [query for query, search in zip(queries, results) if not search]
+                    embed = self.bulk_play_embed(ctx, queries, tracks, missed)
+                elif isinstance(results[0], Playlist):
+                    embed = self.play_command_embed(ctx, results[0])
+                elif player.is_playing and not skip:
+                    embed = self.play_command_embed(ctx, tracks[0])
+
+                if duplicates and embed is not None:
+                    embed.add_field(name="Skipped duplicates", value=duplicates)
+                if unplayable and embed is not None:
+                    embed.add_field(name="Skipped unplayable", value=unplayable)
+                if rejected and embed is not None:
+                    embed.add_field(name=f"{rejected} not queued", value=over_limit)
+
+                next_track = self.take_first_track(player)
+                if next_track is None and player.is_playing:
+                    stop = skip
+        finally:
+            ticket.release()
+
+        if embed is not None:
+            with span("send_embed"):
+                await ctx.send(embed=embed)
+
+        if next_track is not None:
+            with span("player_play", spotify=next_track.spotify):
+                await self.start_playback(player, next_track)
+        elif stop:
+            with span("player_stop"):
+                await player.stop()
 
-            for track in reversed(tracks):
-                player.queue.put_at_front(track)
-                if player.shuffle:
-                    player.shuffled_queue.put_at_front(track)
+    @commands.command(aliases=["p"])
+    async def play(self, ctx: Context, *, query: str = None):
+        """Queues one or multiple tracks. Can be used to resume the player if paused.
+           Several links or searches can be queued at once by putting each one on its own line.
+        """
+        player = ctx.voice_client
 
-            await self.send_play_command_embed(ctx, search)
-        else:
-            track = search[0]
+        if player.is_paused and not query:
+            await player.set_pause(False)
+            return await ctx.send(embed=ctx.embed("Resumed player!"))
+        elif not query:
+            return
 
-            player.queue.put_at_front(track)
-            if player.shuffle:
-                player.shuffled_queue.put_at_front(track)
+        await self.search_and_enqueue(ctx, split_queries(query))
 
-        if not player.is_playing and not player.has_started:
-            await player.play(player.queue.get())
-            player.has_started = True
-        elif not player.is_playing:
-            pass
-        else:
-            await player.stop()
+    @commands.command(aliases=["pn", "playtop", "pt"])
+    async def playnext(self, ctx: Context, *, query: str):
+        """Same as play command, but adds to the start of the queue."""
+        await self.search_and_enqueue(ctx, [query], at_front=True)
+
+    @commands.command(aliases=["ps"])
+    async def playskip(self, ctx: Context, *, query: str):
+        """Same as playnext, but also skips the currently playing track."""
+        await self.search_and_enqueue(ctx, [query], at_front=True, skip=True)
 
     @commands.command(aliases=["shuffleplay", "sp"])
-    @commands.max_concurrency(1, commands.BucketType.guild, wait=True)
     async def playshuffle(self, ctx: Context, *, query: str):
         """Adds the given album/playlist to the queue in random order."""
+        await self.search_and_enqueue(ctx, [query], shuffle=True)
+
+    def import_embed(
+        self,
+        ctx: Context,
+        title: str,
+        searched: int,
+        queued: int,
+        not_found: int,
+        missed: List[str],
+        duplicates: int
+    ) -> Embed:
+        embed = ctx.embed(
+            title,
+            "\n".join(f"Nothing found for `{query}`." for query in missed)[:4000] or Empty
+        )
+        embed.add_field(name="Searched", value=searched)
+        embed.add_field(name="Queued", value=queued)
+
+        if not_found:
+            embed.add_field(name="Not found", value=not_found)
+        if duplicates:
+            embed.add_field(name="Skipped", value=f"{duplicates} duplicate or unplayable")
+
+        return embed
+
+    async def import_results(
+        self,
+        ctx: Context,
+        results: AsyncIterator[Tuple[str, Union[List[Track], Playlist, None]]],
+        progress: Message,
+        filename: str
+    ) -> Embed:
+        """Queues search results of an import in batches as they come in, editing the progress
+        message every so often. Returns the embed summarizing the import.
+        """
         player = ctx.voice_client
-        if not (search := await self.get_tracks(ctx, query)):
-            return await ctx.send(embed=ctx.embed("Nothing found."))
-
-        if isinstance(search, Playlist):
-            tracks = search.tracks
-            random.shuffle(tracks)
-
-            for track in tracks:
-                player.queue.put(track)
-                if player.shuffle:
-                    player.shuffled_queue.put(track)
-
-            await self.send_play_command_embed(ctx, search)
+        loop = asyncio.get_running_loop()
+        last_update = loop.time()
+
+        searched = queued = not_found = duplicates = 0
+        # only the first few misses are listed so memory doesn't grow with the file
+        missed: List[str] = []
+        batch: List[Track] = []
+        title = f"Imported {filename}"
+
+        async for query, search in results:
+            searched += 1
+
+            if isinstance(search, Playlist):
+                batch.extend(search.tracks)
+            elif search:
+                batch.append(search[0])
+            else:
+                not_found += 1
+                if len(missed) < MAX_LISTED_MISSES:
+                    missed.append(query)
+
+            # the first batch is queued as soon as anything is found, so playback
+            # doesn't wait for a whole batch to be searched
+            if len(batch) >= IMPORT_BATCH_SIZE or (batch and not player.has_started):
+                if ctx.voice_client is not player:
+                    title = f"Stopped importing {filename}, I disconnected"
+                    break
+
+                added, skipped, over_limit = await self.enqueue_batch(player, batch)
+                queued += added
+                duplicates += skipped
+                batch = []
+
+                if over_limit:
+                    title = f"Stopped importing {filename}: {over_limit}"
+                    break
+
+            if loop.time() - last_update >= IMPORT_PROGRESS_INTERVAL:
+                last_update = loop.time()
+                await progress.edit(embed=self.import_embed(
+                    ctx, f"Importing {filename}...",
+                    searched, queued, not_found, missed, duplicates
+                ))
         else:
-            track = search[0]
+            if batch and ctx.voice_client is player:
+                added, skipped, over_limit = await self.enqueue_batch(player, batch)
+                queued += added
+                duplicates += skipped
 
-            player.queue.put(track)
-            if player.shuffle:
-                player.shuffled_queue.put(track)
+                if over_limit:
+                    title = f"Stopped importing {filename}: {over_limit}"
+
+        return self.import_embed(ctx, title, searched, queued, not_found, missed, duplicates)
 
-            if player.is_playing:
-                await self.send_play_command_embed(ctx, track)
+    @commands.command(name="import", aliases=["importfile"])
+    async def import_(self, ctx: Context):
+        """Queues every entry of an attached playlist file.
+           Text files take a link or search per line, JSON files an array of links or tracks.
+           M3U playlists are supported too.
+        """
+        if not ctx.message.attachments:
+            raise UserError("Attach a text, M3U or JSON playlist file to import!")
+
+        attachment = ctx.message.attachments[0]
+        limits = limits_for(ctx.guild.id)
+
+        with self.search_counter.claim(ctx.guild.id, ctx.author.id, limits):
+            progress = await ctx.send(embed=ctx.embed(f"Importing {attachment.filename}..."))
+            # what the progress message is left saying if the import fails
+            embed = ctx.embed(f"Failed importing {attachment.filename}")
+
+            try:
+                async with ClientSession() as session, session.get(attachment.url) as response:
+                    if response.status != 200:
+                        raise UserError("Couldn't download the playlist file, try again.")
+
+                    queries = read_queries(
+                        response.content.iter_chunked(8192), file_kind(attachment.filename)
+                    )
+                    results = self.get_tracks_streamed(ctx, (
+                        query async for entry in queries for query in split_queries(entry)
+                    ))
 
-        if not player.is_playing and not player.has_started:
-            await player.play(player.queue.get())
-            player.has_started = True
+                    try:
+                        embed = await self.import_results(
+                            ctx, results, progress, attachment.filename
+                        )
+                    except ValueError as e:
+                        embed = ctx.embed(f"Stopped importing {attachment.filename}: {e}")
+                    finally:
+                        await results.aclose()
+            finally:
+                await progress.edit(embed=embed)
 
     @commands.command()
     async def pause(self, ctx: Context):
@@ -474,35 +1276,66 @@ class Music(Cog):
             embed = ctx.embed("Queue is empty!")
             return await ctx.send(embed=embed)
 
-        queue_items = self.format_queue(queue)
+        queue_items = self.format_queue(queue, start=self.time_until(player, queue, 0))
 
-        current = player.current.original
-        if current.is_stream:
-            current_pos = "stream"
-        else:
-            current_pos = f"{format_time(player.position)}/{format_time(current.length)}"
-
-        cur_title = current.title if not current.spotify else f"{current.author} - {current.title}"
-        queue_items.insert(
-            0,
-            f"**▶ [{cur_title}]({current.uri}) **"
-            f"[{current_pos}] "
-            f"({current.ctx.author.mention})\n"
-        )
+        # nothing plays while tracks are queued after too many failed to play in a row
+        if player.current is not None:
+            current = player.current.original
+            display = track_display(current)
+            if current.is_stream:
+                current_pos = "stream"
+            else:
+                current_pos = f"{format_time(player.position)}/{display.duration}"
+
+            queue_items.insert(
+                0,
+                f"**▶ [{display.title}]({current.uri}) **"
+                f"[{current_pos}] "
+                f"({display.mention})\n"
+            )
 
         q_length = f"{len(queue)} track{'' if len(queue) == 1 else 's'}"
-        if any(t.is_stream for t in queue):
+        if (total := self.time_until(player, queue, len(queue))) is None:
             q_duration = ""
         else:
-            total = format_time(
-                sum(t.length for t in queue) + (current.length - player.position)
-            )
-            q_duration = f" ({total})"
+            q_duration = f" ({format_time(total)})"
 
         await ctx.send(
             embed=ctx.embed(f"Queue - {q_length}{q_duration}", "\n".join(queue_items)[:4000])
         )
 
+    @commands.command(aliases=["when", "timeuntil"])
+    async def eta(self, ctx: Context, position: int = None):
+        """Shows how long until a track in the queue plays.
+           Without a position, it shows when your next track in the queue plays.
+        """
+        player = ctx.voice_client
+        queue = player.queue if not player.shuffle else player.shuffled_queue
+
+        if position is None:
+            index = next(
+                (i for i, t in enumerate(queue) if t.ctx.author.id == ctx.author.id), None
+            )
+            if index is None:
+                return await ctx.send(embed=ctx.embed("You don't have any tracks in the queue!"))
+        elif 1 <= position <= len(queue):
+            index = position - 1
+        else:
+            desc = f"Valid positions are 1-{len(queue)}." if queue else "The queue is empty!"
+            return await ctx.send(embed=ctx.embed("Invalid queue position!", desc))
+
+        track = queue[index]
+        display = track_display(track)
+
+        if (wait := self.time_until(player, queue, index)) is None:
+            desc = "There's a live stream before it, so there's no telling when."
+        else:
+            desc = f"Plays in {format_time(wait)}."
+
+        embed = ctx.embed(f"{display.title} is at position {index + 1}", desc, url=track.uri)
+        embed.add_field(name="Requested by", value=display.mention)
+        await ctx.send(embed=embed)
+
     @commands.command(aliases=["np", "current", "now", "song"])
     async def nowplaying(self, ctx: Context):
         """Shows info about the currently playing track."""
@@ -512,26 +1345,26 @@ class Music(Cog):
             return await ctx.send(embed=ctx.embed("Nothing is playing!"))
 
         track = player.current.original
+        display = track_display(track)
 
         if track.is_stream:
             position = "🔴 Live"
         else:
-            position = f"{format_time(player.position)}/{format_time(track.length)}"
+            position = f"{format_time(player.position)}/{display.duration}"
 
-        title = track.title if not track.spotify else f"{track.author} - {track.title}"
         embed = ctx.embed(
-            title,
+            display.title,
             url=track.uri,
-            thumbnail_url=self.get_embed_thumbnail(track)
+            thumbnail_url=display.thumbnail
         )
         embed.add_field(name="Position", value=position)
 
         if not track.spotify:
             embed.add_field(name="Uploader", value=track.author)
 
-        embed.add_field(name="Requested by", value=track.ctx.author.mention)
+        embed.add_field(name="Requested by", value=display.mention)
 
-        if "youtube" in track.uri:
+        if display.is_youtube:
             embed.set_footer(text="\u200b", icon_url=YOUTUBE_LOGO_URL)
 
         await ctx.send(embed=embed)
@@ -549,15 +1382,24 @@ class Music(Cog):
         await ctx.send(embed=ctx.embed(f"Cleared {amount} song{'' if amount == 1 else 's'}!"))
 
     @commands.command(aliases=["r", "rm"])
-    async def remove(self, ctx: Context, index: int):
-        """Removes a song from the player's queue."""
+    async def remove(self, ctx: Context, *, index: str):
+        """Removes a song from the player's queue.
+           A range of songs can be removed at once, for example `remove 5-20`.
+        """
         player = ctx.voice_client
         queue = player.queue if not player.shuffle else player.shuffled_queue
 
         if not queue:
             return await ctx.send(embed=ctx.embed("The queue is empty!"))
 
-        if index < 1 or index > len(queue):
+        if match := RANGE_RE.fullmatch(index):
+            start, end = int(match.group("start")), int(match.group("end"))
+        elif index.isdigit():
+            start = end = int(index)
+        else:
+            start = end = 0
+
+        if start < 1 or end > len(queue) or start > end:
             if len(queue) == 1:
                 desc = f"Did you mean `{ctx.prefix}{ctx.invoked_with} 1`?"
             else:
@@ -565,17 +1407,47 @@ class Music(Cog):
 
             return await ctx.send(embed=ctx.embed(f"Invalid track number!", desc))
 
-        track = queue[index - 1]
-        del queue[index - 1]
+        if start != end:
+            removed = queue.remove_range(start - 1, end)
+
+            if player.shuffle:
+                removed_ids = {id(t) for t in removed}
+                player.queue.remove_if(lambda t: id(t) in removed_ids)
+
+            return await ctx.send(embed=self.bulk_remove_embed(ctx, removed))
+
+        track = queue[start - 1]
+        del queue[start - 1]
 
         if player.shuffle:
             del player.queue[player.queue.find_position(track)]
 
-        title = track.title if not track.spotify else f"{track.author} - {track.title}"
-        embed = ctx.embed(f"Removed {title}", url=track.uri)
-        embed.add_field(name="Requested by", value=track.ctx.author.mention)
+        display = track_display(track)
+        embed = ctx.embed(f"Removed {display.title}", url=track.uri)
+        embed.add_field(name="Requested by", value=display.mention)
         await ctx.send(embed=embed)
 
+    @commands.command(aliases=["ru", "removefrom"])
+    async def removeuser(self, ctx: Context, *, member: Member = None):
+        """Removes all songs queued by a member from the player's queue, your own by default."""
+        member = member or ctx.author
+        removed = self.remove_matching(ctx.voice_client, lambda t: t.ctx.author.id == member.id)
+
+        if not removed:
+            return await ctx.send(embed=ctx.embed(f"{member.display_name} has no queued songs!"))
+
+        await ctx.send(embed=self.bulk_remove_embed(ctx, removed))
+
+    @commands.command(aliases=["rs", "removelive"])
+    async def removestreams(self, ctx: Context):
+        """Removes all live streams from the player's queue."""
+        removed = self.remove_matching(ctx.voice_client, lambda t: t.is_stream)
+
+        if not removed:
+            return await ctx.send(embed=ctx.embed("There are no streams in the queue!"))
+
+        await ctx.send(embed=self.bulk_remove_embed(ctx, removed))
+
     @commands.command(aliases=["m"])
     async def move(self, ctx: Context, _from: int, _to: int):
         """Moves a song from the first given position to the second one."""
@@ -596,8 +1468,11 @@ class Music(Cog):
         del queue[_from - 1]
         queue.put_at_index(_to - 1, track)
 
-        title = track.title if not track.spotify else f"{track.author} - {track.title}"
-        await ctx.send(embed=ctx.embed(f"Moved {title} to position {_to}"))
+        if player.fair:
+            # fair queues keep tracks in their requester's turns, so it might land elsewhere
+            _to = next(position for position, t in enumerate(queue, 1) if t is track)
+
+        await ctx.send(embed=ctx.embed(f"Moved {track_display(track).title} to position {_to}"))
 
     @commands.command()
     async def shuffle(self, ctx: Context):
@@ -610,6 +1485,28 @@ class Music(Cog):
 
         await ctx.send(embed=ctx.embed(f"{action} shuffle!", desc))
 
+    @commands.command(aliases=["fairqueue", "roundrobin"])
+    async def fair(self, ctx: Context):
+        """Toggles fair queueing, where tracks take turns between the people who queued them."""
+        player = ctx.voice_client
+        player.set_fair(not player.fair)
+
+        action = "Enabled" if player.fair else "Disabled"
+        desc = (
+            "Tracks now take turns between the people who queued them." if player.fair else Empty
+        )
+
+        await ctx.send(embed=ctx.embed(f"{action} fair queue!", desc))
+
+    @commands.command(aliases=["dedup", "nodupe"])
+    async def nodupes(self, ctx: Context):
+        """Toggles rejecting tracks that are already in the queue."""
+        player = ctx.voice_client
+        player.queue.set_dedup(not player.queue.dedup)
+
+        action = "Enabled" if player.queue.dedup else "Disabled"
+        await ctx.send(embed=ctx.embed(f"{action} duplicate protection!"))
+
     @commands.command()
     async def seek(self, ctx: Context, *, time: str):
         """Seeks to a position in the track.
@@ -671,6 +1568,174 @@ class Music(Cog):
         await player.seek(new_position)
         await ctx.send(embed=embed)
 
+    async def save_playlist(self, ctx: Context, name: str, tracks: List[Track]) -> Embed:
+        if len(name) > 100:
+            raise UserError("Playlist names can be at most 100 characters long.")
+
+        if not tracks:
+            raise UserError("There's nothing to save!")
+
+        saved = await self.playlists.run(self.playlists.playlists, ctx.author.id)
+        if len(saved) >= MAX_PLAYLISTS and name.casefold() not in (n.casefold() for n, _ in saved):
+            raise UserError(
+                f"You can only have {MAX_PLAYLISTS} playlists, delete one to save another."
+            )
+
+        count = await self.playlists.run(
+            self.playlists.save, ctx.author.id, name, tracks[:MAX_PLAYLIST_TRACKS]
+        )
+        embed = ctx.embed(
+            f"Saved {count} track{'' if count == 1 else 's'} as {name}",
+            f"Use `{ctx.prefix}playlist load {name}` to queue them again."
+        )
+
+        if len(tracks) > MAX_PLAYLIST_TRACKS:
+            embed.add_field(
+                name=f"{len(tracks) - MAX_PLAYLIST_TRACKS} not saved",
+                value=f"Playlists can have at most {MAX_PLAYLIST_TRACKS} tracks."
+            )
+
+        return embed
+
+    @commands.group(aliases=["pl"], invoke_without_command=True)
+    async def playlist(self, ctx: Context):
+        """Saves the queue as a playlist of your own to queue again later.
+           See the subcommands for saving, loading, listing and deleting them.
+        """
+        await ctx.send_help(ctx.command)
+
+    @playlist.command(name="save")
+    async def playlist_save(self, ctx: Context, *, name: str):
+        """Saves the current track and the queue as a playlist with the given name,
+           replacing one you already have with that name.
+        """
+        player = ctx.voice_client
+        tracks = list(player.queue)
+        if player.current is not None:
+            tracks.insert(0, player.current)
+
+        await ctx.send(embed=await self.save_playlist(ctx, name, tracks))
+
+    @playlist.command(name="savehistory")
+    async def playlist_savehistory(self, ctx: Context, *, name: str):
+        """Saves the tracks played so far as a playlist with the given name."""
+        history = list(ctx.voice_client.queue.history)
+        await ctx.send(embed=await self.save_playlist(ctx, name, history[-MAX_PLAYLIST_TRACKS:]))
+
+    @playlist.command(name="load")
+    async def playlist_load(self, ctx: Context, *, name: str):
+        """Adds one of your saved playlists to the queue."""
+        if await self.playlists.run(self.playlists.track_count, ctx.author.id, name) is None:
+            raise UserError(f"You don't have a playlist called {name}.")
+
+        queued = duplicates = 0
+        over_limit = None
+
+        # each batch is read in the store's thread
+        batches = self.playlists.load(ctx.author.id, name, ctx)
+        try:
+            while tracks := await self.playlists.run(next, batches, None):
+                added, skipped, over_limit = await self.enqueue_batch(ctx.voice_client, tracks)
+                queued += added
+                duplicates += skipped
+
+                if over_limit:
+                    break
+        finally:
+            await self.playlists.run(batches.close)
+
+        embed = ctx.embed(f"Queued {queued} track{'' if queued == 1 else 's'} from {name}")
+        if duplicates:
+            embed.add_field(name="Skipped", value=f"{duplicates} duplicate or unplayable")
+        if over_limit:
+            embed.add_field(name="Stopped loading", value=over_limit)
+
+        await ctx.send(embed=embed)
+
+    @playlist.command(name="list")
+    async def playlist_list(self, ctx: Context):
+        """Lists your saved playlists."""
+        saved = await self.playlists.run(self.playlists.playlists, ctx.author.id)
+        if not saved:
+            raise UserError(
+                f"You don't have any playlists, save one with `{ctx.prefix}playlist save`."
+            )
+
+        await ctx.send(embed=ctx.embed(
+            f"Your playlists ({len(saved)}/{MAX_PLAYLISTS})",
+            "\n".join(f"**{name}** - {count} tracks" for name, count in saved)
+        ))
+
+    @playlist.command(name="delete", aliases=["remove"])
+    async def playlist_delete(self, ctx: Context, *, name: str):
+        """Deletes one of your saved playlists."""
+        if not await self.playlists.run(self.playlists.delete, ctx.author.id, name):
+            raise UserError(f"You don't have a playlist called {name}.")
+
+        await ctx.send(embed=ctx.embed(f"Deleted playlist {name}."))
+
+    @commands.command(aliases=["quotas", "topusers"])
+    @commands.is_owner()
+    async def usage(self, ctx: Context, count: int = 10):
+        """Shows the servers and users with the most queued, and how many searches they run."""
+        count = max(1, min(count, 20))
+        players = [p for p in self.bot.voice_clients if isinstance(p, Player)]
+        searches = self.search_counter
+
+        top_guilds = heapq.nlargest(
+            count, players, key=lambda p: (p.queue.duration[0], p.queue.count)
+        )
+        top_users = heapq.nlargest(count, (
+            (length, tracks, player.guild, user_id)
+            for player in players
+            for user_id, tracks, length in player.queue.usage_by_requester()
+        ), key=lambda usage: usage[:2])
+
+        embed = ctx.embed(
+            "Resource usage",
+            f"{len(players)} players, {sum(searches.guilds.values())} searches running."
+        )
+        embed.add_field(name="Servers", inline=False, value=join_lines(
+            f"`{p.guild.name}` - {p.queue.count} tracks, {format_time(p.queue.duration[0])}, "
+            f"{searches.guilds.get(p.guild.id, 0)} searches"
+            for p in top_guilds
+        ) or "None")
+        embed.add_field(name="Users", inline=False, value=join_lines(
+            f"<@{user_id}> in `{guild.name}` - {tracks} tracks, {format_time(length)}, "
+            f"{searches.users.get((guild.id, user_id), 0)} searches"
+            for length, tracks, guild, user_id in top_users
+        ) or "None")
+
+        admission = self.admission
+        embed.add_field(name="Search admission", inline=False, value=(
+            f"{admission.running} running, {admission.waiting} waiting, "
+            f"{admission.admitted} admitted\n"
+            f"Rejected: {admission.rate_limited} rate limited, "
+            f"{admission.queue_full} with a full queue, {admission.timed_out} timed out\n"
+            f"Answered from played titles: {self.title_hits}"
+        ))
+
+        await ctx.send(embed=embed)
+
+    @commands.command(aliases=["qlog"])
+    @commands.is_owner()
+    async def queuelog(self, ctx: Context, guild_id: int = None):
+        """Sends the latest operations on a server's queues, for queue_replay.py to replay."""
+        guild_id = guild_id or ctx.guild.id
+        if (player := self.bot.pomice.get_node().get_player(guild_id)) is None:
+            raise UserError("There's no player in that server.")
+
+        shuffled = player.shuffled_queue
+        dump = {
+            "guild": guild_id,
+            "queues": {
+                "queue": player.queue.op_log(),
+                "shuffled_queue": None if shuffled is None else shuffled.op_log(),
+            },
+        }
+        file = File(StringIO(json.dumps(dump, separators=(",", ":"))), f"queuelog-{guild_id}.json")
+        await ctx.send(file=file)
+
 
 def setup(bot: Bot):
     bot.add_cog(Music(bot))
@@ -0,0 +1,180 @@
+import codecs
+import json
+from os.path import basename, splitext
+from typing import Any, AsyncIterator, Optional, Tuple
+
+# lines longer than this can't be a link or search, so they're skipped instead of buffered
+MAX_LINE_LENGTH = 2000
+# largest single JSON entry kept in memory while waiting for the rest of it
+MAX_JSON_ENTRY_LENGTH = 16384
+
+URL_KEYS = ("url", "uri", "link")
+TITLE_KEYS = ("title", "name", "track", "trackName")
+ARTIST_KEYS = ("artist", "artists", "author", "artistName")
+
+
+def file_kind(filename: str) -> str:
+    """Guesses the format of a playlist file from its name: "m3u", "json" or "text"."""
+    extension = splitext(filename)[1].lower()
+
+    if extension in (".m3u", ".m3u8"):
+        return "m3u"
+    if extension == ".json":
+        return "json"
+    return "text"
+
+
+async def decode(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decodes UTF-8 chunks as they arrive, without splitting characters between them."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+
+    async for chunk in chunks:
+        if text := decoder.decode(chunk):
+            yield text
+
+    if text := decoder.decode(b"", final=True):
+        yield text
+
+
+async def iter_lines(texts: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Splits decoded text into lines, skipping any longer than MAX_LINE_LENGTH."""
+    buffer = ""
+    too_long = False
+
+    async for text in texts:
+        *lines, buffer = (buffer + text).split("\n")
+
+        for line in lines:
+            if too_long:
+                too_long = False
+            else:
+                yield line.strip()
+
+        if len(buffer) > MAX_LINE_LENGTH:
+            buffer = ""
+            too_long = True
+
+    if buffer and not too_long:
+        yield buffer.strip()
+
+
+async def text_queries(texts: AsyncIterator[str]) -> AsyncIterator[str]:
+    """One link or search per line, lines starting with # are comments."""
+    async for line in iter_lines(texts):
+        if line and not line.startswith("#"):
+            yield line
+
+
+async def m3u_queries(texts: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Links in the playlist are used as they are. Local files are searched for using their
+    #EXTINF title, or their file name if they don't have one.
+    """
+    title = None
+
+    async for line in iter_lines(texts):
+        if not line:
+            continue
+
+        if line.startswith("#EXTINF:"):
+            title = line.partition(",")[2].strip() or None
+        elif not line.startswith("#"):
+            if "://" in line:
+                yield line
+            else:
+                yield title or splitext(basename(line.replace("\\", "/")))[0]
+            title = None
+
+
+def json_query(entry: Any) -> Optional[str]:
+    """Turns a JSON playlist entry into a link or search. Entries are either strings, or
+    objects with a link or a title and artist.
+    """
+    if isinstance(entry, str):
+        return entry.strip() or None
+    if not isinstance(entry, dict):
+        return None
+
+    for key in URL_KEYS:
+        if isinstance(entry.get(key), str):
+            return entry[key]
+
+    title = next((entry[key] for key in TITLE_KEYS if isinstance(entry.get(key), str)), None)
+    if title is None:
+        return None
+
+    artist = next((entry[key] for key in ARTIST_KEYS if key in entry), None)
+    if isinstance(artist, list):
+        names = (a if isinstance(a, str) else a.get("name") for a in artist
+                 if isinstance(a, (str, dict)))
+        artist = ", ".join(name for name in names if isinstance(name, str) and name)
+
+    return f"{artist} - {title}" if isinstance(artist, str) and artist else title
+
+
+def array_start(text: str, in_string: bool, escaped: bool) -> Tuple[Optional[int], bool, bool]:
+    """Finds the first [ in the text that isn't in a string literal. Returns its position, or
+    None, along with the scanner's state to continue with in the next chunk.
+    """
+    for position, char in enumerate(text):
+        if escaped:
+            escaped = False
+        elif in_string:
+            if char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "[":
+            return position, in_string, escaped
+
+    return None, in_string, escaped
+
+
+async def json_queries(texts: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Decodes the entries of the first array in the document one at a time, so both a plain
+    array and an object like {"name": ..., "tracks": [...]} work.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = in_string = escaped = False
+
+    async for text in texts:
+        if not started:
+            # names like "Best of [2023]" come before the array in playlist objects
+            start, in_string, escaped = array_start(text, in_string, escaped)
+            if start is None:
+                continue
+            text = text[start + 1:]
+            started = True
+
+        buffer += text
+
+        while buffer := buffer.lstrip(" \t\r\n,"):
+            if buffer[0] == "]":
+                return
+
+            try:
+                entry, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # most likely cut off by the end of the chunk
+                if len(buffer) > MAX_JSON_ENTRY_LENGTH:
+                    raise ValueError("The JSON file has an entry that's too large.")
+                break
+
+            buffer = buffer[end:]
+            if query := json_query(entry):
+                yield query
+
+    if not started or buffer:
+        raise ValueError("The JSON file doesn't contain a valid array of tracks.")
+
+
+async def read_queries(chunks: AsyncIterator[bytes], kind: str) -> AsyncIterator[str]:
+    """Parses a playlist file of the given kind while it's being downloaded,
+    yielding a query for every entry in it.
+    """
+    parsers = {"m3u": m3u_queries, "json": json_queries, "text": text_queries}
+
+    async for query in parsers[kind](decode(chunks)):
+        yield query
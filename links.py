@@ -0,0 +1,118 @@
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple, Optional
+
+LINK_RE = re.compile(
+    r"""<?\s*(?:
+        (?:https?://)?(?:www\.|m\.|music\.)?
+        (?:youtube\.com/(?:watch\?(?:[^\s>]*?&)?v=|shorts/|embed/|live/|v/)|youtu\.be/)
+        (?P<youtube_video>[\w-]{11})
+    |
+        (?:https?://)?(?:www\.|m\.|music\.)?youtube\.com/playlist\?(?:[^\s>]*?&)?list=
+        (?P<youtube_playlist>[\w-]+)
+    |
+        (?:https?://)?open\.spotify\.com/(?:intl-[\w-]+/)?
+        (?P<spotify_type>track|album|playlist)/(?P<spotify_id>\w+)
+    |
+        spotify:(?P<spotify_uri_type>track|album|playlist):(?P<spotify_uri_id>\w+)
+    |
+        (?P<url>https?://[^\s>]+)
+    )[^\s>]*\s*>?""",
+    re.VERBOSE | re.IGNORECASE
+)
+
+
+class Link(NamedTuple):
+    """What a play query points to.
+    kind is one of "youtube_video", "youtube_playlist", "spotify_track", "spotify_album",
+    "spotify_playlist", "url" or "search". Queries that point to the same thing, however
+    they're spelled, have the same key.
+    """
+
+    kind: str
+    key: str
+    # what to load, a canonical link for anything with an ID
+    query: str
+
+    @property
+    def is_direct(self) -> bool:
+        """Whether the query names what to load, as opposed to searching for it."""
+        return self.kind != "search"
+
+    @property
+    def is_spotify(self) -> bool:
+        return self.kind.startswith("spotify")
+
+
+def classify(query: str) -> Link:
+    query = query.strip()
+
+    if (match := LINK_RE.fullmatch(query)) is None:
+        search = " ".join(query.split())
+        return Link("search", f"search:{search.casefold()}", search)
+
+    if video := match["youtube_video"]:
+        return Link("youtube_video", f"yt:{video}", f"https://www.youtube.com/watch?v={video}")
+
+    if playlist := match["youtube_playlist"]:
+        return Link(
+            "youtube_playlist",
+            f"ytpl:{playlist}",
+            f"https://www.youtube.com/playlist?list={playlist}"
+        )
+
+    kind = match["spotify_type"] or match["spotify_uri_type"]
+    if kind:
+        kind = kind.lower()
+        spotify_id = match["spotify_id"] or match["spotify_uri_id"]
+        return Link(
+            f"spotify_{kind}",
+            f"spotify:{kind}:{spotify_id}",
+            f"https://open.spotify.com/{kind}/{spotify_id}"
+        )
+
+    return Link("url", f"url:{match['url']}", match["url"])
+
+
+class TTLCache:
+    """Least recently used cache whose entries also expire after `ttl` seconds."""
+
+    __slots__ = ("max_size", "ttl", "_entries")
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        # key -> (expiry, value), least recently used first
+        self._entries: OrderedDict[Hashable, tuple] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if (entry := self._entries.get(key)) is None:
+            return None
+
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Caches the value for `ttl` seconds instead of the cache's own ttl if it's given."""
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -0,0 +1,48 @@
+from pomice import Node
+
+from recording import is_recording, record
+
+
+class ResumingNode(Node):
+    """Node that has Lavalink keep its players alive when the websocket connection drops,
+    and resumes them when it reconnects within `resume_timeout` seconds.
+    """
+
+    def __init__(self, *, resume_key: str, resume_timeout: int, **kwargs):
+        super().__init__(**kwargs)
+        self.resume_key = resume_key
+        self.resume_timeout = resume_timeout
+
+        # sent on every (re)connect, which is how Lavalink knows which session to resume
+        self._headers["Resume-Key"] = resume_key
+
+    async def connect(self):
+        node = await super().connect()
+        record("connect")
+
+        # a session that timed out before we reconnected is a new one without resuming
+        # configured, so this is sent on every connect rather than just the first
+        await self.send(op="configureResuming", key=self.resume_key, timeout=self.resume_timeout)
+        return node
+
+    async def _handle_payload(self, data: dict):
+        if is_recording():
+            self._record_payload(data)
+
+        await super()._handle_payload(data)
+
+    def _record_payload(self, data: dict):
+        # the replayer can't decode tracks, so the ones starting are recorded with what the
+        # queue code needs to know about them
+        if data.get("type") == "TrackStartEvent":
+            player = self._players.get(int(data["guildId"]))
+            if player is not None and (track := player.current) is not None:
+                info = {
+                    "identifier": track.identifier,
+                    "length": track.length,
+                    "isStream": track.is_stream,
+                    "spotify": track.spotify
+                }
+                return record("node", d=data, info=info)
+
+        record("node", d=data)
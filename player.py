@@ -1,10 +1,48 @@
-from random import shuffle
-from typing import Optional, Type
+import asyncio
+from collections import deque
+from functools import partial
+from random import randint, shuffle
+from typing import Any, Dict, Iterable, List, Optional, Type
 
 from discord import Client, TextChannel, VoiceChannel
-from pomice import Player
+from pomice import Player, Track
 
-from queues import WaitQueue
+from queues import FairDeque, IndexedList, WaitQueue, by_requester
+from quotas import limits_for
+
+
+class EnqueueTicket:
+    """A command's place in a player's enqueue order.
+    Tickets are handed out in the order commands are invoked and `wait` only returns once
+    every earlier ticket has been released, so slow work like searching can run concurrently
+    before it without reordering the queue.
+    """
+
+    __slots__ = ("_previous", "_released")
+
+    def __init__(self, previous: Optional[asyncio.Future]):
+        self._previous = previous
+        self._released = asyncio.get_event_loop().create_future()
+
+    async def wait(self):
+        """|coro|
+        Wait until all earlier tickets have been released.
+        """
+        if self._previous is not None:
+            # shielded so a cancelled command doesn't cancel the turn of the one before it
+            await asyncio.shield(self._previous)
+
+    def release(self):
+        """Give up this ticket's turn. Safe to call more than once."""
+        if self._released.done():
+            return
+
+        if self._previous is None or self._previous.done():
+            self._released.set_result(None)
+        else:
+            # released before its turn came (e.g. the search failed) - later tickets
+            # still have to wait for the earlier ones
+            self._previous.add_done_callback(lambda _: self.release())
 
 
 class QueuePlayer(Player):
@@ -15,19 +53,95 @@ class QueuePlayer(Player):
 
         self.shuffle = False
         self.shuffled_queue = None
-        self.queue = WaitQueue()
+        self.fair = False
+        # the play commands check the limits first, this only keeps a bug from growing it forever
+        self.queue = WaitQueue(max_size=limits_for(channel.guild.id).queued_tracks)
 
         self.has_started = False
+        self._last_ticket: Optional[asyncio.Future] = None
+        self._voice_update_waiters: List[asyncio.Future] = []
+
+        # set while nobody is listening: whether that paused playback, the task that leaves
+        # the channel once the grace period is over, and the last listener to leave
+        self.auto_paused = False
+        self.empty_timer: Optional[asyncio.Task] = None
+        self.last_listener_id: Optional[int] = None
 
     def __eq__(self, other):
         return self.guild == other.guild
 
+    async def destroy(self):
+        if self.empty_timer is not None:
+            self.empty_timer.cancel()
+            self.empty_timer = None
+
+        await super().destroy()
+
+    async def _dispatch_voice_update(self, voice_data: Dict[str, Any]):
+        await super()._dispatch_voice_update(voice_data)
+
+        if {"sessionId", "event"} == self._voice_state.keys():
+            # lavalink got the new voice server, it's safe to play again
+            waiters, self._voice_update_waiters = self._voice_update_waiters, []
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    def next_voice_update(self) -> asyncio.Future:
+        """Returns a future that's done once the next voice update is sent to Lavalink."""
+        waiter = asyncio.get_event_loop().create_future()
+        self._voice_update_waiters.append(waiter)
+
+        return waiter
+
+    def discard_voice_update(self, waiter: asyncio.Future):
+        """Stops tracking a waiter from `next_voice_update` that's no longer waited for."""
+        try:
+            self._voice_update_waiters.remove(waiter)
+        except ValueError:
+            # already resolved by a voice update
+            pass
+
+    def take_ticket(self) -> EnqueueTicket:
+        """Reserve the next place in the enqueue order. The ticket must always be released."""
+        ticket = EnqueueTicket(self._last_ticket)
+        self._last_ticket = ticket._released
+
+        return ticket
+
+    @property
+    def queue_cls(self):
+        """Container type the player's queue uses, round-robin between requesters if fair."""
+        return partial(FairDeque, key=by_requester) if self.fair else deque
+
+    @property
+    def shuffled_queue_cls(self):
+        """Container type the shuffled queue uses. Tracks get inserted at random positions,
+        so it's an IndexedList unless fair queueing is on.
+        """
+        return partial(FairDeque, key=by_requester) if self.fair else IndexedList
+
+    def set_fair(self, state: bool):
+        self.fair = state
+
+        self.queue.set_queue_cls(self.queue_cls)
+        if self.shuffled_queue is not None:
+            self.shuffled_queue.set_queue_cls(self.shuffled_queue_cls)
+
+    def shuffle_in(self, tracks: Iterable[Track]):
+        """Inserts each track at a uniformly random position of the shuffled queue."""
+        for track in tracks:
+            self.shuffled_queue.put_at_index(randint(0, len(self.shuffled_queue)), track)
+
     def set_shuffle(self, state: bool):
         self.shuffle = state
 
         if state is True:
-            self.shuffled_queue = WaitQueue()
-            self.shuffled_queue.extend(self.queue)
-            shuffle(self.shuffled_queue._queue)
+            # shuffled in one go and loaded into the container in O(n), inserting tracks one by
+            # one at random positions is only worth it for the ones added later
+            tracks = list(self.queue)
+            shuffle(tracks)
+            self.shuffled_queue = WaitQueue(queue_cls=self.shuffled_queue_cls)
+            self.shuffled_queue.replace(tracks)
         else:
             self.shuffled_queue = None
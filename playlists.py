@@ -0,0 +1,130 @@
+import asyncio
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from discord.ext import commands
+from pomice import Track
+
+# sqlite database saved playlists are kept in
+PLAYLIST_DB = "playlists.db"
+# how many saved tracks are turned back into pomice.Track objects at once when loading
+LOAD_BATCH_SIZE = 500
+
+T = TypeVar("T")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlists (
+    id INTEGER PRIMARY KEY,
+    owner INTEGER NOT NULL,
+    name TEXT NOT NULL COLLATE NOCASE,
+    track_count INTEGER NOT NULL,
+    created REAL NOT NULL,
+    UNIQUE (owner, name)
+);
+CREATE TABLE IF NOT EXISTS playlist_tracks (
+    playlist INTEGER NOT NULL REFERENCES playlists (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    track TEXT NOT NULL,
+    info TEXT NOT NULL,
+    spotify INTEGER NOT NULL,
+    PRIMARY KEY (playlist, position)
+) WITHOUT ROWID;
+"""
+
+
+class PlaylistStore:
+    """Users' saved playlists, kept as encoded Lavalink tracks along with their info so
+    loading them needs neither searching nor decoding by Lavalink.
+    The methods block, the bot calls them through `run` so the event loop doesn't wait on disk.
+    """
+
+    def __init__(self, path: str = PLAYLIST_DB):
+        # one thread, so the connection is only ever used by one statement at a time
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="playlists")
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.executescript(SCHEMA)
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """Calls func, one of the store's methods or something using them, in the store's
+        thread and returns what it returned.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def close(self) -> None:
+        """Closes the database once the calls that are already running are done."""
+        self._executor.submit(self._db.close)
+        self._executor.shutdown(wait=False)
+
+    def save(self, owner: int, name: str, tracks: Iterable[Track]) -> int:
+        """Saves the tracks as the owner's playlist, replacing one with the same name.
+        Spotify tracks that were already played are saved as the YouTube track they played as,
+        so they don't have to be searched for again. Returns how many tracks were saved.
+        """
+        rows = []
+        for position, track in enumerate(tracks):
+            track = track.original or track
+            info = json.dumps(track.info, separators=(",", ":"))
+            rows.append((position, track.track_id, info, int(track.spotify)))
+
+        with self._db:
+            self._db.execute("DELETE FROM playlists WHERE owner = ? AND name = ?", (owner, name))
+            playlist = self._db.execute(
+                "INSERT INTO playlists (owner, name, track_count, created) VALUES (?, ?, ?, ?)",
+                (owner, name, len(rows), time.time())
+            ).lastrowid
+            self._db.executemany(
+                "INSERT INTO playlist_tracks VALUES (?, ?, ?, ?, ?)",
+                ((playlist, *row) for row in rows)
+            )
+
+        return len(rows)
+
+    def track_count(self, owner: int, name: str) -> Optional[int]:
+        """Returns how many tracks the owner's playlist has,
+        or None if there's no such playlist.
+        """
+        row = self._db.execute(
+            "SELECT track_count FROM playlists WHERE owner = ? AND name = ?", (owner, name)
+        ).fetchone()
+
+        return None if row is None else row[0]
+
+    def load(
+        self,
+        owner: int,
+        name: str,
+        ctx: commands.Context,
+        batch_size: int = LOAD_BATCH_SIZE
+    ) -> Iterator[List[Track]]:
+        """Yields the owner's playlist in order, in batches of tracks requested through ctx."""
+        cursor = self._db.execute(
+            "SELECT t.track, t.info, t.spotify FROM playlist_tracks t "
+            "JOIN playlists p ON p.id = t.playlist "
+            "WHERE p.owner = ? AND p.name = ? ORDER BY t.position",
+            (owner, name)
+        )
+
+        while rows := cursor.fetchmany(batch_size):
+            yield [
+                Track(track_id=track, info=json.loads(info), ctx=ctx, spotify=bool(spotify))
+                for track, info, spotify in rows
+            ]
+
+    def playlists(self, owner: int) -> List[Tuple[str, int]]:
+        """Returns the names and track counts of the owner's playlists, oldest first."""
+        return self._db.execute(
+            "SELECT name, track_count FROM playlists WHERE owner = ? ORDER BY created", (owner,)
+        ).fetchall()
+
+    def delete(self, owner: int, name: str) -> bool:
+        """Deletes the owner's playlist. Returns False if there was no such playlist."""
+        with self._db:
+            cursor = self._db.execute(
+                "DELETE FROM playlists WHERE owner = ? AND name = ?", (owner, name)
+            )
+
+        return cursor.rowcount > 0
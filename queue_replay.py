@@ -0,0 +1,160 @@
+"""Replays the queue operations dumped by the queuelog command against a fresh Queue, reporting
+the first one that doesn't do what it did in the bot, and times how long they take.
+
+Usage: python queue_replay.py queuelog.json [--queue queue] [--list] [--repeat 100]
+"""
+
+import json
+import time
+from argparse import ArgumentParser
+from collections import deque
+from functools import partial
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from pomice import Track
+
+from queues import FairDeque, IndexedList, Queue, by_requester
+
+CONTAINERS = {
+    "deque": deque,
+    "IndexedList": IndexedList,
+    "FairDeque": partial(FairDeque, key=by_requester),
+}
+# stands in for the members a queue already had when its oldest remembered operation ran
+UNKNOWN = "?"
+
+
+def make_track(identifier: Optional[str], requester_id: Optional[int]) -> Track:
+    ctx = None
+    if requester_id is not None:
+        ctx = SimpleNamespace(author=SimpleNamespace(id=requester_id))
+
+    return Track(track_id="", info={"identifier": identifier or UNKNOWN, "length": 0}, ctx=ctx)
+
+
+def initial_container(log: Dict[str, Any]) -> str:
+    for op in log["ops"]:
+        if op[1] == "n":
+            return op[3]
+        if op[1] == "s":
+            return op[3][0]
+
+    return log["container"]
+
+
+def fresh_queue(log: Dict[str, Any]) -> Queue:
+    """Returns a queue like the dumped one was before its oldest remembered operation,
+    with placeholders for the members it had then, since those operations were forgotten.
+    """
+    queue = Queue(queue_cls=CONTAINERS[initial_container(log)], op_log_size=None)
+    if log["ops"]:
+        for _ in range(log["ops"][0][6]):
+            queue.put(make_track(None, None))
+
+    return queue
+
+
+def same(item: Track, identifier: Optional[str]) -> bool:
+    return item.identifier in (identifier, UNKNOWN)
+
+
+def apply(queue: Queue, op: List[Any]) -> Optional[str]:
+    """Applies one operation, returning what went differently from the bot if anything did."""
+    _, code, index, arg, identifier, requester_id, size = op
+
+    if code != "n" and len(queue) != size:
+        return f"queue had {len(queue)} members instead of {size}"
+
+    if code == "p":
+        queue.put(make_track(identifier, requester_id))
+    elif code == "i":
+        queue.put_at_index(index, make_track(identifier, requester_id))
+    elif code in ("g", "d", "x"):
+        if code == "g":
+            item = queue.get()
+        elif code == "d":
+            item = queue.pop()
+        else:
+            item = queue[index]
+            del queue[index]
+
+        if not same(item, identifier):
+            return f"took {item.identifier} instead of {identifier}"
+    elif code == "r":
+        queue.remove_range(index, arg)
+    elif code == "f":
+        positions = {position for start, stop in arg for position in range(start, stop)}
+        members = iter(range(len(queue)))
+        queue.remove_if(lambda _: next(members) in positions)
+    elif code == "c":
+        queue.clear()
+    elif code == "l":
+        queue.replace(make_track(*member) for member in arg)
+    elif code == "s":
+        queue.set_queue_cls(CONTAINERS[arg[1]])
+
+    return None
+
+
+def replay(log: Dict[str, Any]) -> Tuple[Queue, Optional[Tuple[int, str]]]:
+    """Replays every operation, returning the queue and the position and description of the
+    first operation that went differently, if any did.
+    """
+    queue = fresh_queue(log)
+    for position, op in enumerate(log["ops"]):
+        if (problem := apply(queue, op)) is not None:
+            return queue, (position, problem)
+
+    if len(queue) != len(log["members"]) or not all(
+        same(item, identifier) for item, (identifier, _) in zip(queue, log["members"])
+    ):
+        return queue, (len(log["ops"]), "the replayed members don't match the dumped ones")
+
+    return queue, None
+
+
+def main():
+    parser = ArgumentParser(description="Replays dumped queue operations against a fresh queue.")
+    parser.add_argument("file")
+    parser.add_argument("--queue", help="only replay this queue, e.g. queue or shuffled_queue")
+    parser.add_argument("--list", action="store_true", help="print every operation")
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="how many times to replay, for timing"
+    )
+    args = parser.parse_args()
+
+    with open(args.file, encoding="utf-8") as file:
+        dump = json.load(file)
+
+    for name, log in dump["queues"].items():
+        if args.queue and name != args.queue or log is None:
+            continue
+
+        ops = log["ops"]
+        print(f"{name}: {len(ops)} operations, {log['dropped']} forgotten, {log['container']}")
+
+        if args.list and ops:
+            last = ops[0][0]
+            for position, op in enumerate(ops):
+                print(
+                    f"  {position:>5} +{(op[0] - last) * 1000:>9.1f}ms  {op[1]}  "
+                    f"index={op[2]} arg={op[3]} track={op[4]} requester={op[5]} size={op[6]}"
+                )
+                last = op[0]
+
+        _, problem = replay(log)
+        if problem is None:
+            print("  replayed without differences")
+        else:
+            print(f"  operation {problem[0]} went differently: {problem[1]}")
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            replay(log)
+        took = (time.perf_counter() - start) / args.repeat
+        print(f"  {took * 1000:.2f}ms per replay, {took / max(1, len(ops)) * 1e6:.2f}us per op\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,15 +20,23 @@ SOFTWARE.
 from __future__ import annotations
 
 import asyncio
+import time
 from collections import deque
 from copy import copy
+from itertools import islice
+from random import random
 from typing import (
+    Any,
     AsyncIterator,
+    Callable,
+    Dict,
     Generic,
+    Hashable,
     Iterable,
     Iterator,
     List,
     Optional,
+    Tuple,
     Type,
     TypeVar,
     Union,
@@ -37,11 +45,15 @@ from typing import (
 from pomice import Track
 
 __all__ = (
+    "FairDeque",
+    "IndexedList",
+    "LengthIndex",
     "Queue",
     "QueueEmpty",
     "QueueException"
     "QueueFull",
     "WaitQueue",
+    "by_requester",
 )
 
 
@@ -60,8 +72,593 @@ class QueueEmpty(QueueException):
     pass
 
 
+# rebuilding a LengthIndex's sums from its treap costs about as much as this many appends to
+# the treap, measured with 10k members
+LENGTH_REBUILD_RATIO = 32
+# how many of its latest operations a queue remembers, see Queue.op_log
+OP_LOG_SIZE = 1024
+
+
+def by_requester(item: Track) -> Optional[int]:
+    """FairDeque key that rotates between the users who requested the tracks."""
+    return item.requester.id if item.requester else None
+
+
+def _container_name(queue_cls) -> str:
+    # queue classes can be partials, like FairDeque with its key
+    return getattr(queue_cls, "func", queue_cls).__name__
+
+
+class _Node:
+    __slots__ = ("value", "priority", "left", "right", "size")
+
+    def __init__(self, value: Any):
+        self.value = value
+        self.priority = random()
+        self.left: Optional[_Node] = None
+        self.right: Optional[_Node] = None
+        self.size = 1
+
+    def update(self) -> None:
+        self.size = 1
+        for child in (self.left, self.right):
+            if child is not None:
+                self.size += child.size
+
+
+class _LengthNode(_Node):
+    __slots__ = ("stream", "total", "streams")
+
+    def __init__(self, length: int, stream: bool):
+        super().__init__(length)
+        self.stream = int(bool(stream))
+        self.total = length
+        self.streams = self.stream
+
+    def update(self) -> None:
+        self.size = 1
+        self.total = self.value
+        self.streams = self.stream
+
+        for child in (self.left, self.right):
+            if child is not None:
+                self.size += child.size
+                self.total += child.total
+                self.streams += child.streams
+
+
+def _split(node: Optional[_Node], index: int):
+    """Splits a treap into one with its first `index` nodes and one with the rest."""
+    if node is None:
+        return None, None
+
+    left_size = node.left.size if node.left else 0
+    if index <= left_size:
+        left, node.left = _split(node.left, index)
+        node.update()
+        return left, node
+
+    node.right, right = _split(node.right, index - left_size - 1)
+    node.update()
+    return node, right
+
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    if left is None:
+        return right
+    if right is None:
+        return left
+
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+
+def _build(nodes: List[_Node]) -> Optional[_Node]:
+    """Builds a balanced treap out of nodes in order in O(n)."""
+    def build(start: int, stop: int) -> Optional[_Node]:
+        if start >= stop:
+            return None
+
+        middle = (start + stop) // 2
+        node = nodes[middle]
+        node.left = build(start, middle)
+        node.right = build(middle + 1, stop)
+        return node
+
+    root = build(0, len(nodes))
+
+    # hand out descending priorities level by level so the heap order holds
+    priorities = sorted((random() for _ in nodes), reverse=True)
+    level = [root] if root else []
+    order = []
+    while level:
+        order.extend(level)
+        level = [child for node in level for child in (node.left, node.right) if child]
+
+    for node, priority in zip(order, priorities):
+        node.priority = priority
+    for node in reversed(order):
+        node.update()
+
+    return root
+
+
+def _walk(node: Optional[_Node]) -> Iterator[_Node]:
+    """Iterates over a treap's nodes in order."""
+    stack = []
+    while stack or node is not None:
+        while node is not None:
+            stack.append(node)
+            node = node.left
+
+        node = stack.pop()
+        yield node
+        node = node.right
+
+
+def _node_at(node: _Node, index: int) -> _Node:
+    while True:
+        left_size = node.left.size if node.left else 0
+        if index < left_size:
+            node = node.left
+        elif index == left_size:
+            return node
+        else:
+            index -= left_size + 1
+            node = node.right
+
+
+class LengthIndex:
+    """Sequence of track lengths that keeps running totals by position.
+    Streams count as 0 ms and are tallied separately.
+    Queues are mostly added to at the back and taken from the front, so the totals are kept
+    as cumulative sums in a deque with an offset for what was taken, making those O(1).
+    Inserting or deleting in the middle switches to a treap ordered by position where
+    everything is O(log n). It switches back once there were enough operations at the ends to
+    pay for rebuilding the sums (len / LENGTH_REBUILD_RATIO of them), so mixing the two is
+    amortized O(log n) rather than a rebuild every time.
+    """
+
+    __slots__ = ("_sums", "_base", "_root", "_end_ops")
+
+    def __init__(self, iterable: Iterable[Track] = ()):
+        # (total length, streams) up to and including every member, None while it's a treap
+        self._sums: Optional[deque] = deque()
+        # the totals of members that were taken from the front, subtracted from every sum
+        self._base = (0, 0)
+        self._root: Optional[_LengthNode] = None
+        # operations at the ends since switching to the treap
+        self._end_ops = 0
+
+        total = streams = 0
+        for item in iterable:
+            length, stream = self._value(item)
+            total += length
+            streams += stream
+            self._sums.append((total, streams))
+
+    def __len__(self) -> int:
+        if self._sums is not None:
+            return len(self._sums)
+
+        return self._root.size if self._root else 0
+
+    @staticmethod
+    def _value(item: Track) -> Tuple[int, int]:
+        return (0, 1) if item.is_stream else (item.length or 0, 0)
+
+    def _clamp(self, index: int) -> int:
+        # same semantics as list.insert
+        size = len(self)
+        if index < 0:
+            index = max(0, index + size)
+        return min(index, size)
+
+    def _to_treap(self) -> None:
+        nodes = []
+        previous_total, previous_streams = self._base
+        for total, streams in self._sums:
+            nodes.append(_LengthNode(total - previous_total, streams > previous_streams))
+            previous_total, previous_streams = total, streams
+
+        self._root = _build(nodes)
+        self._sums = None
+        self._base = (0, 0)
+        self._end_ops = 0
+
+    def _to_sums(self) -> None:
+        self._sums = deque()
+        total = streams = 0
+        for node in _walk(self._root):
+            total += node.value
+            streams += node.stream
+            self._sums.append((total, streams))
+
+        self._root = None
+
+    def _end_op(self) -> None:
+        self._end_ops += 1
+        if self._end_ops * LENGTH_REBUILD_RATIO >= len(self):
+            self._to_sums()
+
+    def insert(self, index: int, item: Track) -> None:
+        """Add a track's length at the given position."""
+        index = self._clamp(index)
+        length, stream = self._value(item)
+
+        if self._sums is not None:
+            if index == len(self._sums):
+                total, streams = self._sums[-1] if self._sums else self._base
+                self._sums.append((total + length, streams + stream))
+                return
+            if index == 0:
+                # the new member's sum is the old offset, which moves back by its length
+                total, streams = self._base
+                self._sums.appendleft(self._base)
+                self._base = (total - length, streams - stream)
+                return
+
+            self._to_treap()
+
+        at_end = index in (0, len(self))
+        left, right = _split(self._root, index)
+        self._root = _merge(_merge(left, _LengthNode(length, stream)), right)
+
+        if at_end:
+            self._end_op()
+
+    def delete(self, index: int) -> None:
+        """Remove the length at the given position."""
+        if index < 0:
+            index += len(self)
+
+        if self._sums is not None:
+            if index == 0:
+                self._base = self._sums.popleft()
+                return
+            if index == len(self._sums) - 1:
+                self._sums.pop()
+                return
+
+            self._to_treap()
+
+        at_end = index in (0, len(self) - 1)
+        left, right = _split(self._root, index)
+        _, right = _split(right, 1)
+        self._root = _merge(left, right)
+
+        if at_end:
+            self._end_op()
+
+    def prefix(self, index: int) -> Tuple[int, int]:
+        """Returns the total length of the first `index` tracks and how many are streams."""
+        if self._sums is not None:
+            index = min(index, len(self._sums))
+            if index <= 0:
+                return 0, 0
+
+            total, streams = self._sums[index - 1]
+            return total - self._base[0], streams - self._base[1]
+
+        node = self._root
+        total = streams = 0
+
+        while node is not None and index > 0:
+            left = node.left
+            left_size = left.size if left else 0
+
+            if index <= left_size:
+                node = left
+                continue
+
+            if left is not None:
+                total += left.total
+                streams += left.streams
+
+            total += node.value
+            streams += node.stream
+            index -= left_size + 1
+            node = node.right
+
+        return total, streams
+
+    def clear(self) -> None:
+        self._sums = deque()
+        self._base = (0, 0)
+        self._root = None
+        self._end_ops = 0
+
+
+class IndexedList:
+    """List-like container with O(log n) access, insertion and deletion at any position.
+    Backed by a treap ordered by position. Has the subset of the deque API Queue uses, so it
+    can be used as a Queue's `queue_cls`; slower than a deque at the ends, but doesn't slow
+    down towards the middle of long queues. The shuffled queue uses it, since tracks are
+    inserted into it at random positions.
+    """
+
+    __slots__ = ("_root",)
+
+    def __init__(self, iterable: Iterable[Any] = ()):
+        self._root: Optional[_Node] = _build([_Node(item) for item in iterable])
+
+    def __len__(self) -> int:
+        return self._root.size if self._root else 0
+
+    def __iter__(self) -> Iterator[Any]:
+        return (node.value for node in _walk(self._root))
+
+    def __reversed__(self) -> Iterator[Any]:
+        return reversed(list(self))
+
+    def __contains__(self, item: Any) -> bool:
+        return any(member == item for member in self)
+
+    def __copy__(self) -> IndexedList:
+        return self.__class__(self)
+
+    def _position(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("IndexedList index out of range")
+
+        return index
+
+    def __getitem__(self, index: int) -> Any:
+        return _node_at(self._root, self._position(index)).value
+
+    def __setitem__(self, index: int, item: Any) -> None:
+        _node_at(self._root, self._position(index)).value = item
+
+    def __delitem__(self, index: int) -> None:
+        index = self._position(index)
+
+        left, right = _split(self._root, index)
+        _, right = _split(right, 1)
+        self._root = _merge(left, right)
+
+    def insert(self, index: int, item: Any) -> None:
+        # same semantics as list.insert
+        if index < 0:
+            index = max(0, index + len(self))
+        index = min(index, len(self))
+
+        left, right = _split(self._root, index)
+        self._root = _merge(_merge(left, _Node(item)), right)
+
+    def append(self, item: Any) -> None:
+        self._root = _merge(self._root, _Node(item))
+
+    def appendleft(self, item: Any) -> None:
+        self._root = _merge(_Node(item), self._root)
+
+    def extend(self, iterable: Iterable[Any]) -> None:
+        self._root = _merge(self._root, _build([_Node(item) for item in iterable]))
+
+    def pop(self) -> Any:
+        if not self._root:
+            raise IndexError("pop from an empty IndexedList")
+
+        self._root, last = _split(self._root, len(self) - 1)
+        return last.value
+
+    def popleft(self) -> Any:
+        if not self._root:
+            raise IndexError("pop from an empty IndexedList")
+
+        first, self._root = _split(self._root, 1)
+        return first.value
+
+    def index(self, item: Any) -> int:
+        for index, member in enumerate(self):
+            if member == item:
+                return index
+
+        raise ValueError(f"{item!r} is not in IndexedList")
+
+    def clear(self) -> None:
+        self._root = None
+
+
+class FairDeque:
+    """Deque-like container that orders its members round-robin between keys.
+    The first member of every key comes first, then the second member of every key and so on,
+    with keys in the order they were first added. Can be used as a Queue's `queue_cls`.
+    Taking from either end only touches one key's sub-queue, positional access looks up the
+    round it falls in instead of walking every member.
+    """
+
+    __slots__ = ("_key", "_queues", "_rotation", "_len")
+
+    # adding a member can move other members of its key to later rounds
+    positional = False
+
+    def __init__(self, iterable: Iterable[Any] = (), *, key: Callable[[Any], Hashable]):
+        self._key = key
+        self._queues: Dict[Hashable, deque] = {}
+        self._rotation: deque = deque()
+        self._len = 0
+
+        for item in iterable:
+            self.append(item)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Any]:
+        iterators = deque(iter(self._queues[key]) for key in self._rotation)
+        while iterators:
+            iterator = iterators.popleft()
+            try:
+                yield next(iterator)
+            except StopIteration:
+                continue
+
+            iterators.append(iterator)
+
+    def __reversed__(self) -> Iterator[Any]:
+        return reversed(list(self))
+
+    def __contains__(self, item: Any) -> bool:
+        return any(item in queue for queue in self._queues.values())
+
+    def __getitem__(self, index: int) -> Any:
+        key, position = self._locate(index)
+        return self._queues[key][position]
+
+    def __delitem__(self, index: int) -> None:
+        key, position = self._locate(index)
+        del self._queues[key][position]
+        self._len -= 1
+
+        if not self._queues[key]:
+            self._remove_key(key)
+
+    def __copy__(self) -> FairDeque:
+        new = self.__class__(key=self._key)
+        new._queues = {key: copy(queue) for key, queue in self._queues.items()}
+        new._rotation = copy(self._rotation)
+        new._len = self._len
+
+        return new
+
+    def _locate(self, index: int):
+        """Returns the key and sub-queue position of the member at the given position."""
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("deque index out of range")
+
+        lengths = [(key, len(self._queues[key])) for key in self._rotation]
+
+        # find the last round starting at or before index; every round before it has
+        # taken min(length, round) members from each key
+        low, high = 0, max(length for _, length in lengths)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if sum(min(length, middle) for _, length in lengths) <= index:
+                low = middle
+            else:
+                high = middle - 1
+
+        position = sum(min(length, low) for _, length in lengths)
+        for key, length in lengths:
+            if length > low:
+                if position == index:
+                    return key, low
+                position += 1
+
+    def _remove_key(self, key: Hashable) -> None:
+        del self._queues[key]
+        self._rotation.remove(key)
+
+    def append(self, item: Any) -> None:
+        key = self._key(item)
+        if key not in self._queues:
+            self._queues[key] = deque()
+            self._rotation.append(key)
+
+        self._queues[key].append(item)
+        self._len += 1
+
+    def extend(self, iterable: Iterable[Any]) -> None:
+        for item in iterable:
+            self.append(item)
+
+    def appendleft(self, item: Any) -> None:
+        key = self._key(item)
+        if key in self._queues:
+            self._rotation.remove(key)
+        else:
+            self._queues[key] = deque()
+
+        self._rotation.appendleft(key)
+        self._queues[key].appendleft(item)
+        self._len += 1
+
+    def insert(self, index: int, item: Any) -> None:
+        """Inserts the item into its key's sub-queue in the round of the given position.
+        Members only play in their key's turn, so it can end up slightly off the exact position.
+        """
+        if index <= 0:
+            return self.appendleft(item)
+        if index >= self._len:
+            return self.append(item)
+
+        _, round_ = self._locate(index)
+        key = self._key(item)
+        if key not in self._queues:
+            self._queues[key] = deque()
+            self._rotation.append(key)
+
+        self._queues[key].insert(round_, item)
+        self._len += 1
+
+    def popleft(self) -> Any:
+        if not self._len:
+            raise IndexError("pop from an empty deque")
+
+        key = self._rotation.popleft()
+        item = self._queues[key].popleft()
+        self._len -= 1
+
+        if self._queues[key]:
+            self._rotation.append(key)
+        else:
+            del self._queues[key]
+
+        return item
+
+    def pop(self) -> Any:
+        if not self._len:
+            raise IndexError("pop from an empty deque")
+
+        # the last member is in the last round, from the last key that still has one there
+        longest = max(len(queue) for queue in self._queues.values())
+        key = next(key for key in reversed(self._rotation) if len(self._queues[key]) == longest)
+        item = self._queues[key].pop()
+        self._len -= 1
+
+        if not self._queues[key]:
+            self._remove_key(key)
+
+        return item
+
+    def index(self, item: Any) -> int:
+        for index, member in enumerate(self):
+            if member == item:
+                return index
+
+        raise ValueError(f"{item!r} is not in deque")
+
+    def clear(self) -> None:
+        self._queues.clear()
+        self._rotation.clear()
+        self._len = 0
+
+
 class Queue(Iterable[Track]):
-    __slots__ = ("max_size", "_queue", "_overflow")
+    __slots__ = (
+        "max_size",
+        "_queue",
+        "_queue_cls",
+        "_overflow",
+        "_lengths",
+        "_indexed_threshold",
+        "_length_index",
+        "_total_length",
+        "_streams",
+        "_usage",
+        "_ops",
+        "_op_count",
+    )
 
     def __init__(
         self,
@@ -69,10 +666,31 @@ class Queue(Iterable[Track]):
         *,
         overflow: bool = True,
         queue_cls=deque,
+        indexed_threshold: Optional[int] = None,
+        op_log_size: Optional[int] = OP_LOG_SIZE,
+        length_index: bool = True,
     ):
         self.max_size: Optional[int] = max_size
         self._queue = queue_cls()  # type: ignore
+        self._queue_cls = queue_cls
         self._overflow: bool = overflow
+        self._indexed_threshold: Optional[int] = indexed_threshold
+        # queues that are never asked for durations by position don't need to index them
+        self._length_index = length_index
+        self._lengths: Optional[LengthIndex] = None
+        self._index_lengths()
+
+        # running totals so limits can be checked without walking the queue
+        self._total_length = 0
+        self._streams = 0
+        # requester id -> [member count, total length]
+        self._usage: Dict[Optional[int], List[int]] = {}
+
+        # latest operations as (time, op, index, arg, identifier, requester id, size before),
+        # cheap enough to always keep so corrupted queues can be replayed
+        self._ops: Optional[deque] = deque(maxlen=op_log_size) if op_log_size else None
+        self._op_count = 0
+        self._log("n", arg=_container_name(queue_cls))
 
     def __str__(self) -> str:
         """String showing all pomice.Track objects appearing as a list."""
@@ -114,7 +732,14 @@ class Queue(Iterable[Track]):
 
     def __delitem__(self, index: int) -> None:
         """Delete item at given position."""
+        item = self._queue[index]
+        self._log("x", item, index=index)
+        self._account(item, -1)
         self._queue.__delitem__(index)
+        if self._lengths is not None:
+            self._lengths.delete(index)
+
+        self._pick_container()
 
     def __iter__(self) -> Iterator[Track]:
         """Iterate over members in the queue.
@@ -154,19 +779,118 @@ class Queue(Iterable[Track]):
         raise TypeError(f"Adding '{type(other)}' type to the queue is not supported.")
 
     def _get(self) -> Track:
-        return self._queue.popleft()
+        item = self._queue.popleft()
+        self._log("g", item, size=len(self._queue) + 1)
+        self._account(item, -1)
+        if self._lengths is not None:
+            self._lengths.delete(0)
+
+        self._pick_container()
+        return item
 
     def _drop(self) -> Track:
-        return self._queue.pop()
+        item = self._queue.pop()
+        self._log("d", item, size=len(self._queue) + 1)
+        self._account(item, -1)
+        if self._lengths is not None:
+            self._lengths.delete(-1)
+
+        self._pick_container()
+        return item
 
     def _index(self, item: Track) -> int:
         return self._queue.index(item)
 
     def _put(self, item: Track) -> None:
+        self._log("p", item)
         self._queue.append(item)
+        self._account(item, 1)
+        if self._lengths is not None:
+            self._lengths.insert(len(self._lengths), item)
+
+        self._pick_container()
 
     def _insert(self, index: int, item: Track) -> None:
+        self._log("i", item, index=index)
         self._queue.insert(index, item)
+        self._account(item, 1)
+        if self._lengths is not None:
+            self._lengths.insert(index, item)
+
+        self._pick_container()
+
+    def _replace(self, items: List[Track]) -> None:
+        self._queue.clear()
+        self._queue.extend(items)
+        self._pick_container()
+        self._index_lengths()
+        self._recount()
+
+    def _log(
+        self,
+        op: str,
+        item: Optional[Track] = None,
+        *,
+        index: Optional[int] = None,
+        arg: Any = None,
+        size: Optional[int] = None
+    ) -> None:
+        if self._ops is None:
+            return
+
+        self._op_count += 1
+        self._ops.append((
+            time.monotonic(),
+            op,
+            index,
+            arg,
+            None if item is None else item.identifier,
+            None if item is None else by_requester(item),
+            len(self._queue) if size is None else size
+        ))
+
+    def _account(self, item: Track, sign: int) -> None:
+        length = 0 if item.is_stream else (item.length or 0)
+        self._total_length += sign * length
+        self._streams += sign * int(bool(item.is_stream))
+
+        key = by_requester(item)
+        if (usage := self._usage.get(key)) is None:
+            usage = self._usage[key] = [0, 0]
+
+        usage[0] += sign
+        usage[1] += sign * length
+        if not usage[0]:
+            del self._usage[key]
+
+    def _recount(self) -> None:
+        self._total_length = self._streams = 0
+        self._usage.clear()
+        for item in self._queue:
+            self._account(item, 1)
+
+    def _pick_container(self) -> None:
+        # long deques are O(n) to insert into, delete from or index towards the middle, so
+        # with an indexed_threshold they're swapped for an IndexedList past it and back once
+        # well below it. members keep their positions, so the length index stays valid.
+        # a deque stays faster up to ~100k members (both ~35 us per random insert/delete
+        # there), past the player queue's limits, so it's off unless a queue asks for it
+        if self._indexed_threshold is None or self._queue_cls is not deque:
+            return
+
+        if type(self._queue) is deque:
+            if len(self._queue) > self._indexed_threshold:
+                self._queue = IndexedList(self._queue)
+        elif len(self._queue) < self._indexed_threshold // 4:
+            self._queue = deque(self._queue)
+
+    def _index_lengths(self) -> None:
+        # containers that reorder members on their own can't have their lengths indexed by
+        # position, duration lookups walk them instead
+        if self._length_index and getattr(self._queue, "positional", True):
+            self._lengths = LengthIndex(self._queue)
+        else:
+            self._lengths = None
 
     @staticmethod
     def _check_track(item: Track) -> Track:
@@ -188,6 +912,38 @@ class Queue(Iterable[Track]):
         """Returns queue member count."""
         return len(self._queue)
 
+    @property
+    def duration(self) -> Tuple[int, int]:
+        """Returns the total length of all members and how many of them are streams."""
+        return self._total_length, self._streams
+
+    def op_log(self) -> Dict[str, Any]:
+        """Returns the latest operations on the queue along with its current members, as
+        something JSON serializable that queue_replay.py can replay against a fresh queue.
+        `dropped` is how many older operations were forgotten.
+        Operations are (time, op, index, arg, identifier, requester id, size before) where op is
+        one of n(ew), p(ut), i(nsert), g(et), d(rop), x (delete), r(emove range),
+        f (remove if, with [start, stop] of every run of removed members), c(lear),
+        l (replace, with [identifier, requester id] of every new member) or s(et container).
+        """
+        ops = [] if self._ops is None else list(self._ops)
+        return {
+            "container": _container_name(self._queue_cls),
+            "dropped": self._op_count - len(ops),
+            "ops": ops,
+            "members": [[item.identifier, by_requester(item)] for item in self._queue],
+        }
+
+    def usage(self, requester_id: Optional[int]) -> Tuple[int, int]:
+        """Returns how many members the given user requested and their total length."""
+        count, length = self._usage.get(requester_id, (0, 0))
+        return count, length
+
+    def usage_by_requester(self) -> Iterator[Tuple[Optional[int], int, int]]:
+        """Iterate over (requester id, member count, total length) for every requester."""
+        for requester_id, (count, length) in self._usage.items():
+            yield requester_id, count, length
+
     @property
     def is_empty(self) -> bool:
         """Returns True if queue has no members."""
@@ -214,7 +970,23 @@ class Queue(Iterable[Track]):
         if self.is_empty:
             raise QueueEmpty("No items in the queue.")
 
-        return self._queue.pop()
+        return self._drop()
+
+    def duration_until(self, index: int) -> Tuple[int, int]:
+        """Returns the total length of the members before the given position
+        and how many of them are streams. Streams don't add to the length.
+        """
+        if self._lengths is not None:
+            return self._lengths.prefix(index)
+
+        total = streams = 0
+        for item in islice(self._queue, index):
+            if item.is_stream:
+                streams += 1
+            else:
+                total += item.length or 0
+
+        return total, streams
 
     def find_position(self, item: Track) -> int:
         """Find the position a given item within the queue.
@@ -268,16 +1040,86 @@ class Queue(Iterable[Track]):
         for item in iterable:
             self.put(item)
 
+    def replace(self, iterable: Iterable[Track]) -> None:
+        """Replace all members of the queue with the given ones in a single pass."""
+        items = self._check_track_container(iterable)
+        if self.max_size is not None and len(items) > self.max_size:
+            raise QueueFull(f"Queue max_size of {self.max_size} can't fit {len(items)} items.")
+
+        # the members themselves, replaying placeholders would put them in the wrong turns of
+        # a fair queue
+        self._log("l", arg=[[item.identifier, by_requester(item)] for item in items])
+        self._replace(items)
+
+    def remove_if(self, predicate: Callable[[Track], bool]) -> List[Track]:
+        """Remove all items the predicate returns True for in a single pass.
+        Returns the removed items in queue order.
+        """
+        kept, removed = [], []
+        # [start, stop] of every run of removed positions, so removing most of a long queue
+        # doesn't log every position
+        ranges: List[List[int]] = []
+        for position, item in enumerate(self._queue):
+            if predicate(item):
+                removed.append(item)
+                if ranges and ranges[-1][1] == position:
+                    ranges[-1][1] += 1
+                else:
+                    ranges.append([position, position + 1])
+            else:
+                kept.append(item)
+
+        if removed:
+            self._log("f", arg=ranges)
+            self._replace(kept)
+
+        return removed
+
+    def remove_range(self, start: int, stop: int) -> List[Track]:
+        """Remove the items from position start up to (not including) stop in a single pass.
+        Returns the removed items in queue order.
+        """
+        start, stop, _ = slice(start, stop).indices(self.count)
+        if start >= stop:
+            return []
+
+        self._log("r", index=start, arg=stop)
+        items = list(self._queue)
+        self._replace(items[:start] + items[stop:])
+
+        return items[start:stop]
+
     def copy(self) -> Queue:
         """Create a copy of the current queue including it's members."""
-        new_queue = self.__class__(max_size=self.max_size)
+        new_queue = self.__class__(
+            max_size=self.max_size,
+            queue_cls=self._queue_cls,
+            indexed_threshold=self._indexed_threshold,
+            length_index=self._length_index
+        )
         new_queue._queue = copy(self._queue)
+        new_queue._index_lengths()
+        new_queue._recount()
 
         return new_queue
 
     def clear(self) -> None:
         """Remove all items from the queue."""
+        self._log("c")
         self._queue.clear()
+        if self._lengths is not None:
+            self._lengths.clear()
+
+        self._total_length = self._streams = 0
+        self._usage.clear()
+
+    def set_queue_cls(self, queue_cls) -> None:
+        """Move the queue's members into a new container of the given type, keeping their order."""
+        self._log("s", arg=[_container_name(self._queue_cls), _container_name(queue_cls)])
+        self._queue = queue_cls(self._queue)
+        self._queue_cls = queue_cls
+        self._pick_container()
+        self._index_lengths()
 
 
 class WaitQueue(Queue):
@@ -288,23 +1130,46 @@ class WaitQueue(Queue):
     ----------
     history: :class:`~Queue`
         A history Queue of previously played tracks.
+    dedup: bool
+        Whether identifiers of queued tracks are tracked, making `is_queued` and
+        `filter_duplicates` O(1) per track. Toggle with `set_dedup`.
     """
 
-    __slots__ = ("history", "_waiters", "_finished")
+    __slots__ = ("history", "_waiters", "_finished", "_identifiers")
 
     def __init__(
         self,
         max_size: Optional[int] = None,
         history_max_size: Optional[int] = None,
         history_cls=Queue,
+        *,
+        dedup: bool = False,
+        queue_cls=deque,
+        indexed_threshold: Optional[int] = None,
+        op_log_size: Optional[int] = OP_LOG_SIZE,
+        length_index: bool = True,
     ):
-        super().__init__(max_size, overflow=False)  # type: ignore
-        self.history = history_cls(history_max_size)
+        super().__init__(
+            max_size,
+            overflow=False,
+            queue_cls=queue_cls,
+            indexed_threshold=indexed_threshold,
+            op_log_size=op_log_size,
+            length_index=length_index
+        )  # type: ignore
+        # history is only ever appended to, there's nothing to replay or index
+        self.history = history_cls(
+            history_max_size, indexed_threshold=None, op_log_size=None, length_index=False
+        )
 
         self._waiters = deque()
         self._finished = asyncio.Event()
         self._finished.set()
 
+        # track identifier -> how many times it's queued, None when dedup is disabled
+        self._identifiers: Optional[Dict[str, int]] = None
+        self.set_dedup(dedup)
+
     async def __aiter__(self) -> AsyncIterator[Track]:
         """Pops members as it iterates the queue, waiting for new members when exhausted.
         Removes items when iterating.
@@ -312,20 +1177,91 @@ class WaitQueue(Queue):
         while True:
             yield await self.get_wait()
 
+    def __delitem__(self, index: int) -> None:
+        """Delete item at given position."""
+        if self._identifiers is not None:
+            self._forget(self._queue[index])
+
+        super().__delitem__(index)
+
     def _get(self) -> Track:
         item = super()._get()
         self.history.put(item)
+        self._forget(item)
+
+        return item
+
+    def _drop(self) -> Track:
+        item = super()._drop()
+        self._forget(item)
 
         return item
 
     def _put(self, item: Track) -> None:
         super()._put(item)
+        self._remember(item)
         self._wakeup_next()
 
     def _insert(self, index: int, item: Track) -> None:
-        super()._queue.insert(index, item)
+        super()._insert(index, item)
+        self._remember(item)
         self._wakeup_next()
 
+    def _replace(self, items: List[Track]) -> None:
+        super()._replace(items)
+
+        if self._identifiers is not None:
+            self._identifiers.clear()
+            for item in items:
+                self._remember(item)
+
+        if items:
+            self._wakeup_next()
+
+    def _remember(self, item: Track) -> None:
+        if self._identifiers is not None:
+            self._identifiers[item.identifier] = self._identifiers.get(item.identifier, 0) + 1
+
+    def _forget(self, item: Track) -> None:
+        if self._identifiers is None:
+            return
+
+        if (count := self._identifiers.pop(item.identifier, 0)) > 1:
+            self._identifiers[item.identifier] = count - 1
+
+    @property
+    def dedup(self) -> bool:
+        """Returns True if identifiers of queued tracks are being tracked."""
+        return self._identifiers is not None
+
+    def set_dedup(self, state: bool) -> None:
+        """Enable or disable tracking identifiers of queued tracks."""
+        if not state:
+            self._identifiers = None
+        elif self._identifiers is None:
+            self._identifiers = {}
+            for item in self._queue:
+                self._remember(item)
+
+    def is_queued(self, item: Track) -> bool:
+        """Check if a track with the same identifier is in the queue.
+        Requires dedup to be enabled.
+        """
+        return item.identifier in self._identifiers
+
+    def filter_duplicates(self, iterable: Iterable[Track]) -> List[Track]:
+        """Return the tracks that aren't in the queue yet, without repeats.
+        Requires dedup to be enabled.
+        """
+        seen = set()
+        unique = []
+        for item in iterable:
+            if item.identifier not in self._identifiers and item.identifier not in seen:
+                seen.add(item.identifier)
+                unique.append(item)
+
+        return unique
+
     def _wakeup_next(self) -> None:
         while self._waiters:
             waiter = self._waiters.popleft()
@@ -369,6 +1305,19 @@ class WaitQueue(Queue):
         self._put(item)
         await asyncio.sleep(0)
 
+    def copy(self) -> WaitQueue:
+        """Create a copy of the current queue including it's members."""
+        new_queue = super().copy()
+        new_queue.set_dedup(self.dedup)
+
+        return new_queue
+
+    def clear(self) -> None:
+        """Remove all items from the queue."""
+        super().clear()
+        if self._identifiers is not None:
+            self._identifiers.clear()
+
     def reset(self) -> None:
         """Clears the state of all queues."""
         self.clear()
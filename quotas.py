@@ -0,0 +1,115 @@
+from contextlib import contextmanager
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from discord.ext.commands import CommandError
+from pomice import Track
+
+from queues import Queue, by_requester
+
+HOUR = 60 * 60 * 1000
+
+
+class Limits(NamedTuple):
+    """Resource limits of a guild, None disables a limit. Durations are in milliseconds."""
+
+    queued_tracks: Optional[int] = 10000
+    queued_duration: Optional[int] = 7 * 24 * HOUR
+    searches: Optional[int] = 8
+    # per user of the guild
+    user_queued_tracks: Optional[int] = 2500
+    user_queued_duration: Optional[int] = 2 * 24 * HOUR
+    user_searches: Optional[int] = 2
+
+
+DEFAULT_LIMITS = Limits()
+# guild id -> limits for guilds that get different ones than DEFAULT_LIMITS
+GUILD_LIMITS: Dict[int, Limits] = {}
+
+
+def limits_for(guild_id: int) -> Limits:
+    return GUILD_LIMITS.get(guild_id, DEFAULT_LIMITS)
+
+
+class QuotaExceeded(CommandError):
+    def __init__(self, message: str):
+        self.message = message
+
+
+def fitting_tracks(
+    queue: Queue,
+    tracks: Iterable[Track],
+    limits: Limits
+) -> Tuple[int, Optional[str]]:
+    """Returns how many of the tracks, in order, can be added to the queue without going over
+    the limits, and why the rest can't be. Only looks at the new tracks, the queue's own
+    totals are kept up to date as it changes.
+    """
+    count, length = queue.count, queue.duration[0]
+    # requester id -> [member count, total length] including the tracks that fit so far
+    users: Dict[Optional[int], list] = {}
+    fitting = 0
+
+    for track in tracks:
+        track_length = 0 if track.is_stream else (track.length or 0)
+        key = by_requester(track)
+        if (user := users.get(key)) is None:
+            user = users[key] = list(queue.usage(key))
+
+        if limits.queued_tracks is not None and count >= limits.queued_tracks:
+            return fitting, f"The queue is limited to {limits.queued_tracks} tracks."
+        if limits.queued_duration is not None and length + track_length > limits.queued_duration:
+            return fitting, f"The queue is limited to {limits.queued_duration // HOUR} hours."
+        if limits.user_queued_tracks is not None and user[0] >= limits.user_queued_tracks:
+            return fitting, f"You can only have {limits.user_queued_tracks} tracks queued."
+        if (
+            limits.user_queued_duration is not None
+            and user[1] + track_length > limits.user_queued_duration
+        ):
+            return fitting, (
+                f"You can only have {limits.user_queued_duration // HOUR} hours of tracks queued."
+            )
+
+        count += 1
+        length += track_length
+        user[0] += 1
+        user[1] += track_length
+        fitting += 1
+
+    return fitting, None
+
+
+class SearchCounter:
+    """How many searching commands are running per guild and per user."""
+
+    __slots__ = ("guilds", "users")
+
+    def __init__(self):
+        self.guilds: Dict[int, int] = {}
+        self.users: Dict[Tuple[int, int], int] = {}
+
+    @contextmanager
+    def claim(self, guild_id: int, user_id: int, limits: Limits):
+        """Counts a search for the duration of the block.
+        Raises QuotaExceeded if the guild or user already has too many running.
+        """
+        guild = self.guilds.get(guild_id, 0)
+        user = self.users.get((guild_id, user_id), 0)
+
+        if limits.searches is not None and guild >= limits.searches:
+            raise QuotaExceeded("Too many searches are running in this server, try again soon.")
+        if limits.user_searches is not None and user >= limits.user_searches:
+            raise QuotaExceeded("You already have searches running, wait for them to finish.")
+
+        self.guilds[guild_id] = guild + 1
+        self.users[guild_id, user_id] = user + 1
+
+        try:
+            yield
+        finally:
+            self._release(self.guilds, guild_id)
+            self._release(self.users, (guild_id, user_id))
+
+    @staticmethod
+    def _release(counts: dict, key) -> None:
+        if (count := counts.pop(key)) > 1:
+            counts[key] = count - 1
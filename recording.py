@@ -0,0 +1,56 @@
+import gzip
+import json
+import time
+from typing import Any, Optional, TextIO
+
+# where Lavalink payloads and voice state updates are recorded for replay.py, None disables it
+RECORD_FILE: Optional[str] = None
+
+
+class Recorder:
+    """Appends events to a gzipped file, one compact JSON object per line.
+    Every line has the milliseconds since recording started as "t" and the kind of event as "k".
+    """
+
+    __slots__ = ("_file", "_start")
+
+    def __init__(self, path: str):
+        self._file: TextIO = gzip.open(path, "at", encoding="utf-8")
+        self._start = time.monotonic()
+
+    def record(self, kind: str, **data: Any) -> None:
+        line = {"t": round((time.monotonic() - self._start) * 1000), "k": kind, **data}
+        self._file.write(json.dumps(line, separators=(",", ":")) + "\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+_recorder: Optional[Recorder] = None
+
+
+def start_recording(path: str, **data: Any) -> None:
+    """Starts recording to the file, with the data in its first line."""
+    global _recorder
+
+    stop_recording()
+    _recorder = Recorder(path)
+    _recorder.record("start", **data)
+
+
+def stop_recording() -> None:
+    global _recorder
+
+    if _recorder is not None:
+        _recorder.close()
+        _recorder = None
+
+
+def is_recording() -> bool:
+    return _recorder is not None
+
+
+def record(kind: str, **data: Any) -> None:
+    """Records an event if recording, does nothing otherwise."""
+    if _recorder is not None:
+        _recorder.record(kind, **data)
@@ -0,0 +1,286 @@
+"""Replays events written by recording.py into the Music cog, with local stand-ins for Discord
+and Lavalink, and prints how long its listeners took.
+
+Usage: python replay.py events.jsonl.gz [--speed 10]
+"""
+
+import asyncio
+import gzip
+import json
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from discord.ext.commands import Cog
+from pomice import Node, NodePool, Track
+
+from cogs.music import Music
+from context import Context
+from player import QueuePlayer
+from trace_report import percentile
+
+# seconds to let listeners finish after the last event before cancelling them
+GRACE_PERIOD = 5
+
+
+def read_events(path: str) -> Iterator[Dict[str, Any]]:
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            yield json.loads(line)
+
+
+class StandIn:
+    """Accepts any awaited call, for the Discord objects whose responses the cog ignores."""
+
+    def __init__(self, **attributes: Any):
+        self.__dict__.update(attributes)
+
+    async def send(self, *args, **kwargs):
+        return StandIn(delete=self._nothing, edit=self._nothing)
+
+    @staticmethod
+    async def _nothing(*args, **kwargs):
+        pass
+
+
+class StandInContext(StandIn):
+    color = Context.color
+    embed = Context.embed
+
+    def __init__(self, user_id: int):
+        avatar = StandIn(url="https://cdn.discordapp.com/embed/avatars/0.png")
+        super().__init__(
+            author=StandIn(id=user_id, mention=f"<@{user_id}>", display_avatar=avatar),
+            message=StandIn(created_at=datetime.utcnow()),
+            prefix="a!"
+        )
+
+
+class StandInGuild(StandIn):
+    def __init__(self, guild_id: int):
+        super().__init__(id=guild_id, name=str(guild_id))
+        self.channels: Dict[int, StandIn] = {}
+        self.members: Dict[int, StandIn] = {}
+
+    def get_member(self, member_id: int, bot: bool) -> StandIn:
+        if (member := self.members.get(member_id)) is None:
+            voice = StandIn(deaf=False, self_deaf=False)
+            member = StandIn(id=member_id, guild=self, bot=bot, voice=voice)
+            self.members[member_id] = member
+
+        return member
+
+    def get_channel(self, channel_id: Optional[int]) -> Optional[StandIn]:
+        if channel_id is None:
+            return None
+
+        if (channel := self.channels.get(channel_id)) is None:
+            channel = self.channels[channel_id] = StandIn(
+                id=channel_id,
+                name=str(channel_id),
+                mention=f"<#{channel_id}>",
+                guild=self,
+                members=[],
+                _get_voice_client_key=lambda: (self.id, "guild_id")
+            )
+
+        return channel
+
+    async def change_voice_state(self, **kwargs):
+        pass
+
+
+class StandInNode:
+    """Takes Lavalink's place, counting what would have been sent to it."""
+
+    _handle_payload = Node._handle_payload
+
+    def __init__(self):
+        self._identifier = "REPLAY"
+        self._available = True
+        self._players: Dict[int, QueuePlayer] = {}
+        self._stats = None
+        self.sent: Dict[str, int] = defaultdict(int)
+
+    def get_player(self, guild_id: int) -> Optional[QueuePlayer]:
+        return self._players.get(guild_id)
+
+    async def send(self, **data):
+        self.sent[data["op"]] += 1
+
+    async def get_tracks(self, query: str, *, ctx=None, **kwargs) -> List[Track]:
+        # spotify tracks are searched for on youtube when they're played
+        self.sent["loadtracks"] += 1
+        return [Track(track_id=query, info={"title": query, "uri": "", "length": 0}, ctx=ctx)]
+
+
+class StandInBot:
+    """Dispatches events to the cog's listeners, timing how long each one runs."""
+
+    def __init__(self, user_id: int):
+        self.user = StandIn(id=user_id)
+        self.pomice = NodePool()
+        self._connection = StandIn(_remove_voice_client=lambda key: None)
+        self.listeners: Dict[str, list] = defaultdict(list)
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+        # listeners still running when the replay ended, like track ends waiting on a queue
+        self.unfinished: Dict[str, int] = defaultdict(int)
+        self.tasks = set()
+
+    @property
+    def voice_clients(self) -> List[QueuePlayer]:
+        return list(self.pomice.get_node()._players.values())
+
+    def add_cog(self, cog: Cog):
+        for name, method in cog.get_listeners():
+            self.listeners[name].append(method)
+
+    def get_channel(self, channel_id: int) -> StandIn:
+        return StandIn(id=channel_id)
+
+    def dispatch(self, event: str, *args):
+        for listener in self.listeners[f"on_{event}"]:
+            task = asyncio.create_task(self._timed(event, listener(*args)))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _timed(self, event: str, coro):
+        start = time.perf_counter()
+        try:
+            await coro
+        except asyncio.CancelledError:
+            self.unfinished[event] += 1
+            raise
+        except Exception as e:
+            print(f"{event} listener raised {e!r}")
+
+        self.durations[event].append((time.perf_counter() - start) * 1000)
+
+
+class Replay:
+    def __init__(self, path: str):
+        self.path = path
+        start = next(read_events(path))
+        self.bot = StandInBot(start.get("bot", 0))
+        self.node = StandInNode()
+        NodePool._nodes = {self.node._identifier: self.node}
+
+        self.cog = Music(self.bot)
+        self.bot.add_cog(self.cog)
+        self.guilds: Dict[int, StandInGuild] = {}
+
+    def player(self, guild_id: int) -> QueuePlayer:
+        if (player := self.node.get_player(guild_id)) is None:
+            guild = self.guilds.setdefault(guild_id, StandInGuild(guild_id))
+            player = QueuePlayer(self.bot, guild.get_channel(0))
+            player.bound_channel = guild.get_channel(1)
+            player._is_connected = True
+            self.node._players[guild_id] = player
+
+        return player
+
+    def fill_queues(self):
+        """Queues every track that started in the recording, in order, so the cog plays the
+        same tracks when their previous ones end.
+        """
+        for event in read_events(self.path):
+            data = event.get("d", {})
+            if data.get("type") != "TrackStartEvent":
+                continue
+
+            info = event.get("info", {})
+            player = self.player(int(data["guildId"]))
+            track = Track(
+                track_id=data.get("track", ""),
+                info={"title": data.get("track", ""), "uri": "", **info},
+                ctx=StandInContext(0),
+                spotify=info.get("spotify", False)
+            )
+
+            if not player.has_started:
+                # already playing, so there's no youtube search to stand in for
+                track.original = track
+                player._current = track
+                player.has_started = True
+            else:
+                player.queue.put(track)
+
+    async def run(self, speed: float) -> Tuple[float, float]:
+        """Feeds the events in at `speed` times their original pace, 0 meaning as fast as
+        possible. Returns the seconds the recording spans and the seconds replaying it took.
+        """
+        self.fill_queues()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        last = 0
+
+        for event in read_events(self.path):
+            last = event["t"]
+            if speed and (delay := start + last / 1000 / speed - loop.time()) > 0:
+                await asyncio.sleep(delay)
+
+            if event["k"] == "node":
+                if (guild_id := event["d"].get("guildId")) is not None:
+                    self.player(int(guild_id))
+                await self.node._handle_payload(event["d"])
+            elif event["k"] == "voice":
+                guild = self.guilds.setdefault(event["g"], StandInGuild(event["g"]))
+                member = guild.get_member(event["m"], bot=event["m"] == self.bot.user.id)
+                before, after = guild.get_channel(event["b"]), guild.get_channel(event["a"])
+
+                if before is not None and member in before.members:
+                    before.members.remove(member)
+                if after is not None:
+                    after.members.append(member)
+
+                self.bot.dispatch(
+                    "voice_state_update", member, StandIn(channel=before), StandIn(channel=after)
+                )
+
+            # lets listeners run between events like they would with a real connection
+            await asyncio.sleep(0)
+
+        took = loop.time() - start
+        if self.bot.tasks:
+            await asyncio.wait(self.bot.tasks, timeout=GRACE_PERIOD)
+        for task in self.bot.tasks:
+            task.cancel()
+
+        return last / 1000, took
+
+
+def main():
+    parser = ArgumentParser(description="Replays recorded events against local stand-ins.")
+    parser.add_argument("file")
+    parser.add_argument(
+        "--speed", type=float, default=1,
+        help="how many times faster than recorded to replay, 0 for as fast as possible"
+    )
+    args = parser.parse_args()
+
+    replay = Replay(args.file)
+    recorded, took = asyncio.run(replay.run(args.speed))
+
+    print(f"replayed {recorded:.1f}s of events in {took:.1f}s\n")
+    print(
+        f"{'listener':<24}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}"
+        f"{'unfinished':>12}"
+    )
+
+    for name, values in sorted(replay.bot.durations.items()):
+        print(
+            f"{name:<24}{len(values):>8}"
+            f"{percentile(values, 0.5):>10.2f}{percentile(values, 0.95):>10.2f}"
+            f"{percentile(values, 0.99):>10.2f}{max(values):>10.2f}"
+            f"{replay.bot.unfinished[name]:>12}"
+        )
+
+    print("\nsent to lavalink: " + ", ".join(
+        f"{op} {count}" for op, count in sorted(replay.node.sent.items())
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import random
+import unittest
+
+from pomice import Track
+
+from queue_replay import replay
+from queues import LengthIndex, Queue, WaitQueue
+
+
+def make_track(identifier: str, length: int = 1000, stream: bool = False) -> Track:
+    return Track(
+        track_id=identifier,
+        info={"identifier": identifier, "length": length, "isStream": stream}
+    )
+
+
+class WaitQueueTest(unittest.TestCase):
+    def test_copy_and_add(self):
+        queue = WaitQueue(dedup=True)
+        queue.extend(make_track(str(i)) for i in range(3))
+
+        copied = queue.copy()
+        added = queue + [make_track("3")]
+
+        self.assertEqual([t.identifier for t in copied], ["0", "1", "2"])
+        self.assertEqual([t.identifier for t in added], ["0", "1", "2", "3"])
+        self.assertEqual(added.duration, (4000, 0))
+        self.assertEqual(added.duration_until(2), (2000, 0))
+        self.assertTrue(copied.dedup)
+        self.assertEqual(len(queue), 3)
+
+
+class OpLogTest(unittest.TestCase):
+    def test_remove_if_logs_runs(self):
+        queue = Queue()
+        queue.extend(make_track(str(i)) for i in range(1000))
+
+        removed = queue.remove_if(lambda t: int(t.identifier) % 100 < 90)
+        log = queue.op_log()
+
+        self.assertEqual(len(removed), 900)
+        self.assertEqual(log["ops"][-1][3], [[i, i + 90] for i in range(0, 1000, 100)])
+        self.assertIsNone(replay(log)[1])
+
+
+class LengthIndexTest(unittest.TestCase):
+    def test_prefix_matches_list(self):
+        rng = random.Random(0)
+        index, tracks = LengthIndex(), []
+
+        for step in range(5000):
+            roll = rng.random()
+            if roll < 0.5 or not tracks:
+                track = make_track(str(step), rng.randint(1, 9) * 1000, rng.random() < 0.1)
+                position = rng.choice((len(tracks), 0, rng.randint(0, len(tracks))))
+                index.insert(position, track)
+                tracks.insert(position, track)
+            else:
+                position = rng.choice((0, len(tracks) - 1, rng.randrange(len(tracks))))
+                index.delete(position)
+                del tracks[position]
+
+            position = rng.randint(0, len(tracks))
+            expected = (
+                sum(0 if t.is_stream else t.length for t in tracks[:position]),
+                sum(bool(t.is_stream) for t in tracks[:position])
+            )
+            self.assertEqual(index.prefix(position), expected)
+            self.assertEqual(len(index), len(tracks))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import re
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Set
+
+from pomice import Track
+
+TOKEN_RE = re.compile(r"\w+")
+# "(Official Video)", "[HD]" and the like don't have to be searched for to match a title
+BRACKETS_RE = re.compile(r"\([^)]*\)|\[[^\]]*\]")
+NOISE_WORDS = frozenset((
+    "official", "video", "music", "audio", "lyrics", "lyric", "hd", "hq", "4k", "mv",
+    "ft", "feat", "the", "a", "of"
+))
+
+# tracks a guild's index remembers, the least recently played are forgotten first
+MAX_TITLES = 500
+# a query's last word matches the start of a word if it's at least this long, since it's
+# often still being typed
+MIN_PREFIX_LENGTH = 3
+# share of a title's words a query must contain to be served from the index
+MIN_COVERAGE = 0.75
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall(text.casefold()) if text else []
+
+
+class _Entry:
+    __slots__ = ("track", "tokens", "required", "played")
+
+    def __init__(self, track: Track, title: str, author: str, played: int):
+        self.track = track
+        self.tokens: FrozenSet[str] = frozenset(tokenize(title) + tokenize(author))
+        # the words a query has to mention, the author is optional
+        required = set(tokenize(BRACKETS_RE.sub(" ", title or ""))) - NOISE_WORDS
+        self.required: FrozenSet[str] = frozenset(required or self.tokens)
+        self.played = played
+
+
+class TitleIndex:
+    """Word index over the titles and authors of recently played tracks, so searches for
+    something that was played before can be answered with its track instead of searching again.
+    """
+
+    __slots__ = ("max_size", "_entries", "_postings", "_played")
+
+    def __init__(self, max_size: int = MAX_TITLES):
+        self.max_size = max_size
+        # track identifier -> entry, least recently played first
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        # word -> identifiers of the tracks with it
+        self._postings: Dict[str, Set[str]] = {}
+        self._played = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, track: Track, title: Optional[str] = None, author: Optional[str] = None):
+        """Remembers a played track under its title and author, or the ones given, which is
+        how spotify tracks are found by their own title rather than the youtube one.
+        """
+        if not track.identifier or not track.track_id:
+            return
+
+        self.remove(track.identifier)
+
+        self._played += 1
+        entry = _Entry(track, title or track.title, author or track.author, self._played)
+        self._entries[track.identifier] = entry
+        for token in entry.tokens:
+            self._postings.setdefault(token, set()).add(track.identifier)
+
+        if len(self._entries) > self.max_size:
+            self.remove(next(iter(self._entries)))
+
+    def remove(self, identifier: str):
+        if (entry := self._entries.pop(identifier, None)) is None:
+            return
+
+        for token in entry.tokens:
+            postings = self._postings[token]
+            postings.discard(identifier)
+            if not postings:
+                del self._postings[token]
+
+    def _candidates(self, words: List[str]) -> Set[str]:
+        if len(words) == 1:
+            return self._postings.get(words[0], set())
+
+        # the rarest whole word narrows it down the most
+        return min((self._postings.get(word, set()) for word in words[:-1]), key=len)
+
+    def match(self, query: str) -> Optional[Track]:
+        """Returns the most recently played track the query names well enough, if any.
+        Every word of the query has to be in the track's title or author, and the query has
+        to mention most of the title.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return None
+
+        *whole, last = words
+        best = None
+        best_score = (MIN_COVERAGE, 0)
+
+        for identifier in self._candidates(words):
+            entry = self._entries[identifier]
+            if not all(word in entry.tokens for word in whole):
+                continue
+
+            if last in entry.tokens:
+                matched = set(words)
+            elif len(words) > 1 and len(last) >= MIN_PREFIX_LENGTH:
+                matched = set(whole)
+                matched.update(token for token in entry.tokens if token.startswith(last))
+                if len(matched) == len(whole):
+                    continue
+            else:
+                continue
+
+            score = (len(entry.required & matched) / len(entry.required), entry.played)
+            if score >= best_score:
+                best, best_score = entry, score
+
+        return None if best is None else best.track
+
+    def clear(self):
+        self._entries.clear()
+        self._postings.clear()
@@ -0,0 +1,58 @@
+"""Turns the spans written by tracing.py into per-step latency breakdowns.
+
+Usage: python trace_report.py [traces.jsonl] [--command play] [--guild ID]
+"""
+
+import json
+from argparse import ArgumentParser
+from collections import defaultdict
+from typing import Dict, List
+
+from tracing import TRACE_FILE
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return sorted(values)[index]
+
+
+def main():
+    parser = ArgumentParser(description="Summarizes command latency traces.")
+    parser.add_argument("file", nargs="?", default=TRACE_FILE)
+    parser.add_argument("--command", help="only include traces of this command")
+    parser.add_argument("--guild", type=int, help="only include traces from this guild")
+    args = parser.parse_args()
+
+    durations: Dict[str, List[float]] = defaultdict(list)
+    traces = set()
+
+    with open(args.file, encoding="utf-8") as file:
+        for line in file:
+            span = json.loads(line)
+
+            if args.command and span.get("command") != args.command:
+                continue
+            if args.guild and span.get("guild") != args.guild:
+                continue
+
+            traces.add(span["trace"])
+            durations[span["name"]].append(span["duration"])
+
+    if not traces:
+        return print("No matching traces.")
+
+    total = sum(durations.get("command", [])) or 1
+    print(f"{len(traces)} traces\n")
+    print(f"{'span':<20}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'share':>8}")
+
+    for name, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+        print(
+            f"{name:<20}{len(values):>8}"
+            f"{percentile(values, 0.5):>10.1f}{percentile(values, 0.95):>10.1f}"
+            f"{percentile(values, 0.99):>10.1f}{max(values):>10.1f}"
+            f"{sum(values) / total:>8.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
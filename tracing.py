@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import count
+from typing import Any, Dict, List, Optional
+
+# where sampled traces are appended to, one span per line
+TRACE_FILE = "traces.jsonl"
+# fraction of commands that get traced, 0 disables tracing
+SAMPLE_RATE = 0.1
+
+_trace: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+_parent: ContextVar[int] = ContextVar("parent", default=0)
+
+# lines of finished traces that haven't been written yet
+_pending: List[str] = []
+_writing = False
+
+
+class Trace:
+    """Spans recorded for a single sampled command invocation.
+    Spans are kept in memory and queued to be written to TRACE_FILE when the trace finishes.
+    The root span has id 0 and covers the whole trace.
+    """
+
+    __slots__ = ("trace_id", "attributes", "spans", "_ids", "_start")
+
+    def __init__(self, **attributes: Any):
+        self.trace_id = os.urandom(8).hex()
+        self.attributes = attributes
+        self.spans: List[Dict[str, Any]] = []
+        self._ids = count(1)
+        self._start = time.perf_counter()
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def add_span(
+        self,
+        span_id: int,
+        parent: Optional[int],
+        name: str,
+        start: float,
+        end: float,
+        **attributes: Any
+    ) -> None:
+        self.spans.append({
+            "trace": self.trace_id,
+            "span": span_id,
+            "parent": parent,
+            "name": name,
+            "start": round((start - self._start) * 1000, 3),
+            "duration": round((end - start) * 1000, 3),
+            **self.attributes,
+            **attributes
+        })
+
+    def finish(self, **attributes: Any) -> None:
+        self.add_span(0, None, "command", self._start, time.perf_counter(), **attributes)
+        _pending.extend(json.dumps(span) + "\n" for span in self.spans)
+        _flush()
+
+
+def _write(lines: List[str]) -> None:
+    with open(TRACE_FILE, "a", encoding="utf-8") as file:
+        file.write("".join(lines))
+
+
+def _flush() -> None:
+    """Writes the pending lines in the default executor, one write at a time so traces aren't
+    interleaved. Lines that finish meanwhile are written once the running write is done.
+    """
+    global _writing
+
+    if _writing or not _pending:
+        return
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        write_pending()
+        return
+
+    lines = _pending.copy()
+    _pending.clear()
+    _writing = True
+    loop.run_in_executor(None, _write, lines).add_done_callback(_written)
+
+
+def _written(future: "asyncio.Future[None]") -> None:
+    global _writing
+
+    _writing = False
+    if future.exception() is None:
+        _flush()
+
+
+def write_pending() -> None:
+    """Writes the lines still waiting to be written, blocking. For shutting down."""
+    lines = _pending.copy()
+    _pending.clear()
+    if lines:
+        _write(lines)
+
+
+def start_trace(**attributes: Any) -> Optional[Trace]:
+    """Starts tracing the current task if it's sampled. Spans opened from it (and from tasks
+    it starts) are added to the trace until `finish_trace` is called.
+    """
+    if random.random() >= SAMPLE_RATE:
+        _trace.set(None)
+        return None
+
+    trace = Trace(**attributes)
+    _trace.set(trace)
+    _parent.set(0)
+
+    return trace
+
+
+def finish_trace(**attributes: Any) -> None:
+    """Writes the current task's trace, if any, with the attributes added to its root span."""
+    if (trace := _trace.get()) is not None:
+        _trace.set(None)
+        trace.finish(**attributes)
+
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """Records how long the block takes as a span of the current trace.
+    Does nothing if the current task isn't being traced.
+    """
+    if (trace := _trace.get()) is None:
+        yield
+        return
+
+    span_id = trace.next_id()
+    parent = _parent.get()
+    token = _parent.set(span_id)
+    start = time.perf_counter()
+
+    try:
+        yield
+    except BaseException as e:
+        attributes["error"] = type(e).__name__
+        raise
+    finally:
+        _parent.reset(token)
+        trace.add_span(span_id, parent, name, start, time.perf_counter(), **attributes)